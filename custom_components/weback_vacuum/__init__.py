@@ -1,17 +1,24 @@
 """Support for WeBack robot vacuums."""
 
+import asyncio
 import logging
+import os
+import time
 
 from homeassistant.helpers.discovery import load_platform
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import STORAGE_DIR
 import voluptuous as vol
 from homeassistant.const import (
     CONF_API_VERSION,
     CONF_CLIENT_ID,
     CONF_PASSWORD,
     CONF_USERNAME,
+    EVENT_HOMEASSISTANT_STOP,
 )
 
+from .mapview import WebackDiagnosticsView, WebackMapTileView, WebackMapView
 from .vacdevice import VacDevice
 from .webackapi import WebackApi
 
@@ -21,12 +28,27 @@ DOMAIN = "weback_vacuum"
 CONF_REGION = "region"
 CONF_LANGUAGE = "language"
 CONF_APP = "application"
+CONF_HEATMAP = "heatmap"
+CONF_LAZY_MAP = "lazy_map"
+CONF_RECORD_WSS = "record_wss"
+CONF_METRICS = "metrics"
 
 # Default values
 DEFAULT_LANGUAGE = "en"
 DEFAULT_APP = "WeBack"
 DEFAULT_CLIENT_ID = "yugong_app"
 DEFAULT_API_VERS = "1.0"
+DEFAULT_HEATMAP = False
+DEFAULT_LAZY_MAP = False
+DEFAULT_RECORD_WSS = False
+DEFAULT_METRICS = False
+
+# Robots set up at the same time, and time given to each one to load its map
+MAX_PARALLEL_SETUP = 4
+ROBOT_SETUP_TIMEOUT = 60
+
+# Sent with each VacDevice once it is ready, for platforms to add its entities
+SIGNAL_NEW_DEVICE = f"{DOMAIN}_new_device"
 
 CONFIG_SCHEMA = vol.Schema(
     {
@@ -39,6 +61,10 @@ CONFIG_SCHEMA = vol.Schema(
                 vol.Optional(CONF_APP, default=DEFAULT_APP): cv.string,
                 vol.Optional(CONF_CLIENT_ID, default=DEFAULT_CLIENT_ID): cv.string,
                 vol.Optional(CONF_API_VERSION, default=DEFAULT_API_VERS): cv.string,
+                vol.Optional(CONF_HEATMAP, default=DEFAULT_HEATMAP): cv.boolean,
+                vol.Optional(CONF_LAZY_MAP, default=DEFAULT_LAZY_MAP): cv.boolean,
+                vol.Optional(CONF_RECORD_WSS, default=DEFAULT_RECORD_WSS): cv.boolean,
+                vol.Optional(CONF_METRICS, default=DEFAULT_METRICS): cv.boolean,
             },
         ),
     },
@@ -77,7 +103,22 @@ async def async_setup(hass, config):
 
     _LOGGER.debug("Weback vacuum robots: %s", robots)
 
-    for robot in robots:
+    lazy_map = config[DOMAIN].get(CONF_LAZY_MAP)
+    metrics = config[DOMAIN].get(CONF_METRICS)
+    heatmap_dir = None
+    if config[DOMAIN].get(CONF_HEATMAP):
+        heatmap_dir = hass.config.path(STORAGE_DIR, DOMAIN)
+    record_dir = None
+    if config[DOMAIN].get(CONF_RECORD_WSS):
+        record_dir = hass.config.path(STORAGE_DIR, DOMAIN, "wss")
+
+    _LOGGER.debug("Starting vacuum robot components")
+    setup_views_and_platforms(hass, config, metrics)
+
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_SETUP)
+
+    async def async_setup_robot(robot):
+        """Load robot map, then hand it over to platforms"""
         _LOGGER.info(
             "Found robot : %s, nickname : %s",
             robot["thing_name"],
@@ -96,12 +137,67 @@ async def async_setup(hass, config):
             config[DOMAIN].get(CONF_APP),
             config[DOMAIN].get(CONF_CLIENT_ID),
             config[DOMAIN].get(CONF_API_VERSION),
+            heatmap_dir=heatmap_dir,
+            lazy_map=lazy_map,
+            metrics=metrics,
         )
-        await vacuum_device.load_maps()
+        if lazy_map:
+            _LOGGER.debug(
+                "Map of robot %s will be loaded on demand",
+                robot["thing_name"],
+            )
+        else:
+            async with semaphore:
+                try:
+                    await asyncio.wait_for(
+                        vacuum_device.load_maps(),
+                        ROBOT_SETUP_TIMEOUT,
+                    )
+                except TimeoutError:
+                    _LOGGER.warning(
+                        "Map of robot %s not loaded after %ss, "
+                        "it will be loaded from robot updates",
+                        robot["thing_name"],
+                        ROBOT_SETUP_TIMEOUT,
+                    )
+                except Exception:
+                    _LOGGER.exception(
+                        "Error while loading map of robot %s",
+                        robot["thing_name"],
+                    )
+
+        if record_dir:
+            await async_record_wss(hass, vacuum_device, record_dir)
+
         hass.data[DOMAIN].append(vacuum_device)
+        async_dispatcher_send(hass, SIGNAL_NEW_DEVICE, vacuum_device)
 
-    if hass.data[DOMAIN]:
-        _LOGGER.debug("Starting vacuum robot components")
-        load_platform(hass, "vacuum", DOMAIN, {}, config)
-        load_platform(hass, "camera", DOMAIN, {}, config)
+    await asyncio.gather(*(async_setup_robot(robot) for robot in robots))
     return True
+
+
+def setup_views_and_platforms(hass, config, metrics):
+    """Register HTTP views and load platforms, they add robots as they get ready"""
+    hass.http.register_view(WebackMapView(hass, hass.data[DOMAIN]))
+    hass.http.register_view(WebackMapTileView(hass, hass.data[DOMAIN]))
+    hass.http.register_view(WebackDiagnosticsView(hass, hass.data[DOMAIN]))
+    load_platform(hass, "vacuum", DOMAIN, {}, config)
+    load_platform(hass, "camera", DOMAIN, {}, config)
+    if metrics:
+        load_platform(hass, "sensor", DOMAIN, {}, config)
+
+
+async def async_record_wss(hass, vacuum_device, record_dir):
+    """Record WSS frames of a robot, until Home Assistant stops"""
+    path = os.path.join(
+        record_dir,
+        f"{vacuum_device.name}_{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz",
+    )
+    _LOGGER.info("Recording WSS frames of robot %s into %s", vacuum_device.name, path)
+    await hass.async_add_executor_job(vacuum_device.start_recording, path)
+
+    async def async_stop_recording(event):
+        """Close recording, for the file to be complete"""
+        await hass.async_add_executor_job(vacuum_device.stop_recording)
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_stop_recording)
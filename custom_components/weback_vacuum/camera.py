@@ -2,30 +2,39 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 
+from aiohttp import web
 from homeassistant.components.camera import (
     ENTITY_ID_FORMAT,
     Camera,
 )
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import generate_entity_id
 
-from . import DOMAIN, VacDevice
+from . import DOMAIN, SIGNAL_NEW_DEVICE, VacDevice
 
 _LOGGER = logging.getLogger(__name__)
 
+MJPEG_BOUNDARY = "frameboundary"
+# Resend the current frame to idle viewers so proxies keep the stream open
+STREAM_KEEPALIVE = 30
+
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
-    """Set up the camera entities for each robot"""
-    vacuums = []
+    """Set up the camera entities, as each robot gets ready"""
 
-    for device in hass.data[DOMAIN]:
+    @callback
+    def async_add_camera(device):
         entity_id = generate_entity_id(ENTITY_ID_FORMAT, device.name, hass=hass)
-        vacuums.append(WebackVacuumCamera(device, entity_id))
-
-    _LOGGER.debug("Adding Weback Vacuums Maps to Home Assistant: %s", vacuums)
+        _LOGGER.debug("Adding Weback Vacuum Map to Home Assistant: %s", entity_id)
+        async_add_entities([WebackVacuumCamera(device, entity_id)])
 
-    async_add_entities(vacuums)
+    for device in hass.data[DOMAIN]:
+        async_add_camera(device)
+    async_dispatcher_connect(hass, SIGNAL_NEW_DEVICE, async_add_camera)
 
 
 class WebackVacuumCamera(Camera):
@@ -33,6 +42,9 @@ class WebackVacuumCamera(Camera):
     Weback Camera
     """
 
+    # Large and only changing with the map, keep them out of the recorder
+    _unrecorded_attributes = frozenset({"calibration_points", "rooms"})
+
     def __init__(self, device: VacDevice, entity_id):
         """Initialize the Weback Vacuum Map"""
         super().__init__()
@@ -40,6 +52,8 @@ class WebackVacuumCamera(Camera):
         self._vacdevice.register_map_camera(self)
         self.content_type = "image/png"
         self._error = None
+        self._frame_event = asyncio.Event()
+        self._mjpeg_part = (None, None)
         _LOGGER.info("Vacuum Camera initialized: %s", self.name)
 
     @property
@@ -54,6 +68,7 @@ class WebackVacuumCamera(Camera):
 
     @property
     def extra_state_attributes(self):
+        """Map card attributes, same objects as long as the map is unchanged"""
         attributes = {}
         if self._vacdevice.map is not None:
             attributes["calibration_points"] = self._vacdevice.map.calibration_points()
@@ -61,6 +76,15 @@ class WebackVacuumCamera(Camera):
 
         return attributes
 
+    async def async_camera_image(
+        self,
+        width: int | None = None,
+        height: int | None = None,
+    ) -> bytes | None:
+        """Return bytes of camera image, loading the map on first demand."""
+        await self._vacdevice.ensure_map()
+        return self.camera_image(width, height)
+
     def camera_image(
         self,
         width: int | None = None,
@@ -73,3 +97,55 @@ class WebackVacuumCamera(Camera):
 
     def generate_image(self):
         return self._vacdevice.map_image_buffer
+
+    def map_updated(self):
+        """New map revision has been rendered (thread safe)"""
+        if self.hass is None:
+            return
+        self.schedule_update_ha_state(True)
+        self.hass.loop.call_soon_threadsafe(self._publish_frame)
+
+    def _publish_frame(self):
+        """Wake up every stream viewer waiting for a new frame"""
+        self._frame_event.set()
+        self._frame_event = asyncio.Event()
+
+    def _get_mjpeg_part(self):
+        """Return the multipart chunk of the current frame, shared by all viewers"""
+        image = self._vacdevice.map_image_buffer
+        if image is None:
+            return None
+        if self._mjpeg_part[0] is not image:
+            header = (
+                f"--{MJPEG_BOUNDARY}\r\n"
+                f"Content-Type: {self.content_type}\r\n"
+                f"Content-Length: {len(image)}\r\n\r\n"
+            )
+            self._mjpeg_part = (image, header.encode() + image + b"\r\n")
+        return self._mjpeg_part[1]
+
+    async def handle_async_mjpeg_stream(self, request):
+        """Push a frame to the viewer each time a new map revision is rendered"""
+        await self._vacdevice.ensure_map()
+        response = web.StreamResponse()
+        response.content_type = f"multipart/x-mixed-replace;boundary={MJPEG_BOUNDARY}"
+        await response.prepare(request)
+
+        last_part = None
+        keepalive = False
+        try:
+            while True:
+                frame_event = self._frame_event
+                part = self._get_mjpeg_part()
+                if part is not None and (part is not last_part or keepalive):
+                    await response.write(part)
+                    last_part = part
+                try:
+                    await asyncio.wait_for(frame_event.wait(), STREAM_KEEPALIVE)
+                    keepalive = False
+                except TimeoutError:
+                    keepalive = True
+        except ConnectionResetError:
+            _LOGGER.debug("Vacuum Camera: stream viewer disconnected")
+
+        return response
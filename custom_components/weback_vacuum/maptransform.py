@@ -0,0 +1,65 @@
+"""Coordinate transforms between map spaces, without imaging dependencies."""
+
+
+class VacMapTransform:
+    """
+    Affine transform between two map coordinate spaces, map axes are never
+    rotated so it is a scale and an offset per axis
+    """
+
+    __slots__ = ("offset_x", "offset_y", "scale_x", "scale_y")
+
+    def __init__(self, scale_x, scale_y, offset_x=0, offset_y=0):
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+    def _params(self):
+        return (self.scale_x, self.scale_y, self.offset_x, self.offset_y)
+
+    def __eq__(self, other):
+        if not isinstance(other, VacMapTransform):
+            return NotImplemented
+        return self._params() == other._params()
+
+    def __hash__(self):
+        return hash(self._params())
+
+    def then(self, other):
+        """Transform applying this one, then other"""
+        return VacMapTransform(
+            self.scale_x * other.scale_x,
+            self.scale_y * other.scale_y,
+            self.offset_x * other.scale_x + other.offset_x,
+            self.offset_y * other.scale_y + other.offset_y,
+        )
+
+    def inverse(self):
+        return VacMapTransform(
+            1 / self.scale_x,
+            1 / self.scale_y,
+            -self.offset_x / self.scale_x,
+            -self.offset_y / self.scale_y,
+        )
+
+    def point(self, x, y):
+        return x * self.scale_x + self.offset_x, y * self.scale_y + self.offset_y
+
+    def points(self, xs, ys):
+        """Transform a batch of points given as x and y sequences"""
+        scale_x, scale_y = self.scale_x, self.scale_y
+        offset_x, offset_y = self.offset_x, self.offset_y
+        return [
+            (x * scale_x + offset_x, y * scale_y + offset_y)
+            for x, y in zip(xs, ys, strict=True)
+        ]
+
+    def points_rounded(self, xs, ys):
+        """Transform a batch of points, rounded to integer coordinates"""
+        scale_x, scale_y = self.scale_x, self.scale_y
+        offset_x, offset_y = self.offset_x, self.offset_y
+        return [
+            (round(x * scale_x + offset_x), round(y * scale_y + offset_y))
+            for x, y in zip(xs, ys, strict=True)
+        ]
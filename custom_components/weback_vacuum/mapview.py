@@ -0,0 +1,127 @@
+"""HTTP views exporting Weback Vacuum maps (vector data, tiles) and diagnostics."""
+
+import logging
+from http import HTTPStatus
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class WebackMapView(HomeAssistantView):
+    """
+    Vector map of a robot, for client side rendering.
+
+    Query parameters (all optional):
+    - map_id: map the client state comes from, the others are ignored if it
+      is not the current map
+    - since: revision already known by the client, unchanged parts are left out
+    - path_session / path_offset: session and point count of the path already
+      known by the client, only the new points are sent if the path is the same
+    """
+
+    url = "/api/weback_vacuum/{thing_name}/map"
+    name = "api:weback_vacuum:map"
+
+    def __init__(self, hass, devices):
+        """Initialize the map view"""
+        self.hass = hass
+        self.devices = devices
+
+    async def get(self, request, thing_name):
+        """Return the vector map of a robot"""
+        device = _get_device(self.devices, thing_name)
+        if device is not None:
+            await device.ensure_map()
+        if device is None or device.map is None:
+            return self.json_message("Map not found", HTTPStatus.NOT_FOUND)
+
+        try:
+            since = _int_param(request, "since")
+            path_session = _int_param(request, "path_session")
+            path_offset = _int_param(request, "path_offset") or 0
+        except ValueError:
+            return self.json_message("Invalid parameter", HTTPStatus.BAD_REQUEST)
+
+        map_id = request.query.get("map_id")
+
+        _LOGGER.debug(
+            "WebackMapView: map %s of %s since %s, path %s from %s",
+            map_id,
+            thing_name,
+            since,
+            path_session,
+            path_offset,
+        )
+        vector = await self.hass.async_add_executor_job(
+            device.map.get_vector,
+            since,
+            path_session,
+            path_offset,
+            map_id,
+        )
+        return self.json(vector)
+
+
+class WebackMapTileView(HomeAssistantView):
+    """
+    PNG tile of a robot map (grid and cleaning path), zoom level z being
+    2^z pixels per map cell
+    """
+
+    url = r"/api/weback_vacuum/{thing_name}/tiles/{zoom:\d+}/{x:\d+}/{y:\d+}.png"
+    name = "api:weback_vacuum:tiles"
+
+    def __init__(self, hass, devices):
+        """Initialize the map tile view"""
+        self.hass = hass
+        self.devices = devices
+
+    async def get(self, request, thing_name, zoom, x, y):
+        """Return a map tile of a robot"""
+        device = _get_device(self.devices, thing_name)
+        if device is not None:
+            await device.ensure_map()
+        if device is None or device.map is None:
+            return self.json_message("Map not found", HTTPStatus.NOT_FOUND)
+
+        tile = await self.hass.async_add_executor_job(
+            device.map.get_tile,
+            int(zoom),
+            int(x),
+            int(y),
+        )
+        if tile is None:
+            return self.json_message("Tile not found", HTTPStatus.NOT_FOUND)
+        return web.Response(body=tile, content_type="image/png")
+
+
+class WebackDiagnosticsView(HomeAssistantView):
+    """Diagnostics of a robot, as JSON (timings of the map pipeline)"""
+
+    url = "/api/weback_vacuum/{thing_name}/diagnostics"
+    name = "api:weback_vacuum:diagnostics"
+
+    def __init__(self, hass, devices):
+        """Initialize the diagnostics view"""
+        self.hass = hass
+        self.devices = devices
+
+    async def get(self, request, thing_name):
+        """Return diagnostics of a robot"""
+        device = _get_device(self.devices, thing_name)
+        if device is None:
+            return self.json_message("Robot not found", HTTPStatus.NOT_FOUND)
+        return self.json(device.get_diagnostics())
+
+
+def _get_device(devices, thing_name):
+    return next((device for device in devices if device.name == thing_name), None)
+
+
+def _int_param(request, name):
+    value = request.query.get(name)
+    if value is None:
+        return None
+    return int(value)
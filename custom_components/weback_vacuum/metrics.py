@@ -0,0 +1,301 @@
+"""
+Timing metrics of the map pipeline stages, and command round trips
+
+Each stage keeps its last durations (rolling window) for p50, p95 and max,
+with bytes it took in and gave out. Disabled metrics (NULL_METRICS) hand out
+a shared timer doing nothing.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+
+# Durations kept per stage
+METRICS_WINDOW = 200
+
+# Commands kept for diagnostics, and time given to the robot to confirm one
+RECENT_COMMANDS = 20
+CONFIRM_TIMEOUT = 120
+
+ROBOT_UPDATE = "thing_status_update"
+
+
+def percentile(values, fraction):
+    """Value at fraction of sorted values (nearest rank)"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class StageMetrics:
+    """Rolling durations and bytes of a stage"""
+
+    __slots__ = ("bytes_in", "bytes_out", "count", "durations")
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.durations = deque(maxlen=window)
+        self.count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, duration, bytes_in=0, bytes_out=0):
+        self.durations.append(duration)
+        self.count += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def summary(self):
+        durations = sorted(self.durations)
+        if not durations:
+            return {"count": self.count}
+        return {
+            "count": self.count,
+            "p50_ms": round(percentile(durations, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(durations, 0.95) * 1000, 3),
+            "max_ms": round(durations[-1] * 1000, 3),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+
+class StageTimer:
+    """Context manager timing a stage, bytes_out can be set before it exits"""
+
+    __slots__ = ("bytes_in", "bytes_out", "stage", "start")
+
+    def __init__(self, stage, bytes_in):
+        self.stage = stage
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.stage.add(
+                time.perf_counter() - self.start,
+                self.bytes_in,
+                self.bytes_out,
+            )
+
+
+class _NullTimer:
+    """Timer of disabled metrics"""
+
+    bytes_in = 0
+    bytes_out = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return None
+
+
+class PipelineMetrics:
+    """Metrics of the map pipeline stages of a robot"""
+
+    enabled = True
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.stages = {}
+        # Stages are added from WSS and executor threads, read from the loop
+        self._lock = threading.Lock()
+
+    def timer(self, stage, bytes_in=0):
+        """Time a stage: with metrics.timer("stage", len(data)) as timer: ..."""
+        return StageTimer(self._stage(stage), bytes_in)
+
+    def add(self, stage, duration, bytes_in=0, bytes_out=0):
+        """Add a duration measured out of a timer"""
+        self._stage(stage).add(duration, bytes_in, bytes_out)
+
+    def _stage(self, stage):
+        stage_metrics = self.stages.get(stage)
+        if stage_metrics is None:
+            with self._lock:
+                stage_metrics = self.stages.setdefault(
+                    stage,
+                    StageMetrics(self.window),
+                )
+        return stage_metrics
+
+    def summary(self):
+        with self._lock:
+            stages = list(self.stages.items())
+        return {stage: metrics.summary() for stage, metrics in stages}
+
+
+class _NullMetrics:
+    """Disabled metrics, nothing is timed nor kept"""
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def timer(self, stage, bytes_in=0):
+        return self._timer
+
+    def add(self, stage, duration, bytes_in=0, bytes_out=0):
+        return None
+
+    def summary(self):
+        return {}
+
+
+NULL_METRICS = _NullMetrics()
+
+
+class CommandTrace:
+    """A command, and when it was published, answered and confirmed"""
+
+    __slots__ = ("command", "confirmed", "first_frame", "id", "published", "sent")
+
+    def __init__(self, trace_id, command):
+        self.id = trace_id
+        self.command = command
+        self.sent = time.monotonic()
+        self.published = None
+        self.first_frame = None
+        self.confirmed = None
+
+    def confirmed_by(self, status):
+        """Tell if status reports the command state (keys it knows about)"""
+        known = [key for key in self.command if key in status]
+        return bool(known) and all(status[key] == self.command[key] for key in known)
+
+    def summary(self):
+        def elapsed(start, end):
+            if start is None or end is None:
+                return None
+            return round((end - start) * 1000, 1)
+
+        return {
+            "id": self.id,
+            "command": self.command,
+            "publish_ms": elapsed(self.sent, self.published),
+            "first_frame_ms": elapsed(self.published, self.first_frame),
+            "confirm_ms": elapsed(self.published, self.confirmed),
+        }
+
+
+class CommandTracer:
+    """
+    Round trips of commands, from send_command to the status confirming them:
+    publish, first frame from the cloud and confirming status latencies, with
+    counts of publishes, retries, reconnects and socket resets
+    """
+
+    enabled = True
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.latency = PipelineMetrics(window)
+        self.pending = []
+        self.recent = deque(maxlen=RECENT_COMMANDS)
+        self.counters = dict.fromkeys(
+            (
+                "commands",
+                "confirmed",
+                "unconfirmed",
+                "publishes",
+                "publish_failures",
+                "retries",
+                "reconnects",
+                "socket_resets",
+            ),
+            0,
+        )
+
+    def count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def start(self, command):
+        """Trace a new command (state sent to the robot)"""
+        trace = CommandTrace(next(self._ids), command)
+        self.count("commands")
+        return trace
+
+    def publishing(self, trace):
+        """Command is being sent, frames may answer it from now on"""
+        now = time.monotonic()
+        with self._lock:
+            if trace.published is None:
+                self.recent.append(trace)
+                self.pending.append(trace)
+            trace.published = now
+
+    def published(self, trace, success):
+        """Command publish is over, it failed after all retries if not success"""
+        with self._lock:
+            if success:
+                self.latency.add("publish", trace.published - trace.sent)
+                return
+            self.counters["publish_failures"] += 1
+            if trace in self.pending:
+                self.pending.remove(trace)
+            trace.published = trace.first_frame = None
+
+    def frame_received(self, frame):
+        """A frame came from the cloud, it may answer or confirm commands"""
+        if not self.pending:
+            return
+        now = time.monotonic()
+        status = None
+        if frame.get("notify_info") == ROBOT_UPDATE:
+            status = frame.get("thing_status")
+        with self._lock:
+            pending = []
+            for trace in self.pending:
+                if trace.first_frame is None:
+                    trace.first_frame = now
+                    self.latency.add("first_frame", now - trace.published)
+                if status is not None and trace.confirmed_by(status):
+                    trace.confirmed = now
+                    self.latency.add("confirm", now - trace.published)
+                    self.counters["confirmed"] += 1
+                elif now - trace.published > CONFIRM_TIMEOUT:
+                    self.counters["unconfirmed"] += 1
+                else:
+                    pending.append(trace)
+            self.pending = pending
+
+    def summary(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "latency": self.latency.summary(),
+                "pending": len(self.pending),
+                "recent": [trace.summary() for trace in self.recent],
+            }
+
+
+class _NullCommandTracer:
+    """Disabled command tracing"""
+
+    enabled = False
+
+    def count(self, counter):
+        return None
+
+    def start(self, command):
+        return None
+
+    def publishing(self, trace):
+        return None
+
+    def published(self, trace, success):
+        return None
+
+    def frame_received(self, frame):
+        return None
+
+    def summary(self):
+        return {}
+
+
+NULL_COMMAND_TRACER = _NullCommandTracer()
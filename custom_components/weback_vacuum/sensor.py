@@ -0,0 +1,55 @@
+"""Diagnostic sensors of Weback Vacuum Robots (map pipeline timings)."""
+
+import logging
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from . import DOMAIN, SIGNAL_NEW_DEVICE, VacDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Set up the diagnostic sensors, as each robot gets ready"""
+
+    @callback
+    def async_add_sensor(device):
+        _LOGGER.debug("Adding Weback Vacuum render sensor: %s", device.name)
+        async_add_entities([WebackMapRenderSensor(device)])
+
+    for device in hass.data[DOMAIN]:
+        async_add_sensor(device)
+    async_dispatcher_connect(hass, SIGNAL_NEW_DEVICE, async_add_sensor)
+
+
+class WebackMapRenderSensor(SensorEntity):
+    """
+    Map render time (p95) of a robot, with every map pipeline stage timings
+    as attributes
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:timer-outline"
+    # Changing at each render, keep them out of the recorder
+    _unrecorded_attributes = frozenset({"stages"})
+
+    def __init__(self, device: VacDevice):
+        """Initialize the render sensor"""
+        self.device = device
+        self._attr_name = f"{device.nickname} map render"
+        self._attr_unique_id = f"{device.name}_map_render"
+
+    @property
+    def native_value(self):
+        """p95 of the map render time"""
+        return self.device.metrics.summary().get("render_map", {}).get("p95_ms")
+
+    @property
+    def extra_state_attributes(self):
+        """Timings of each map pipeline stage"""
+        return {"stages": self.device.metrics.summary()}
@@ -1,16 +1,88 @@
 """
 VacDevice Module
+
+Map subsystem (vacmap, with PIL) is only imported once a map is loaded,
+from worker threads, so that robots without maps don't pay for it.
 """
 
 import asyncio
 import io
 import logging
+import os
+from dataclasses import dataclass
 
-from .vacmap import VacMap, VacMapDraw
+from .maptransform import VacMapTransform
+from .metrics import CommandTracer, PipelineMetrics
 from .webackapi import WebackWssCtrl
 
 _LOGGER = logging.getLogger(__name__)
 
+# Map card coordinates to the ones expected by robot commands
+CARD_TO_COMMAND = VacMapTransform(0.1, 0.1)
+
+
+@dataclass(frozen=True, slots=True)
+class VacStatus:
+    """Robot status, parsed once per thing_status_update"""
+
+    current_mode: str
+    is_available: bool
+    is_cleaning: bool
+    is_charging: bool
+    error_info: str | None
+    battery_level: int
+    fan_status: str | None
+    mop_status: str | None
+    vacuum_or_mop: int
+    # None when the robot doesn't report them
+    clean_time: int | None
+    clean_area: float | None
+    volume: int | None
+    voice: str | None
+    undisturb_mode: str | None
+
+    @classmethod
+    def from_thing_status(cls, status):
+        """Parse a raw thing_status dict"""
+        current_mode = status.get("working_status", WebackWssCtrl.IDLE_MODE)
+        fan_status = status.get("fan_status")
+        mop_status = status.get("water_level")
+
+        if "fan_status" in status and "water_level" in status:
+            if (
+                fan_status == WebackWssCtrl.FAN_DISABLED
+                and mop_status != WebackWssCtrl.MOP_DISABLED
+            ):
+                vacuum_or_mop = WebackWssCtrl.MOP_ON
+            else:
+                vacuum_or_mop = WebackWssCtrl.VACUUM_ON
+        else:
+            vacuum_or_mop = WebackWssCtrl.NO_FAN_NO_MOP
+
+        clean_time = None
+        if "clean_time" in status:
+            clean_time = status["clean_time"] or 0
+        clean_area = None
+        if "clean_area" in status:
+            clean_area = status["clean_area"] or 0
+
+        return cls(
+            current_mode=current_mode,
+            is_available=status.get("connected") == "true",
+            is_cleaning=current_mode in WebackWssCtrl.CLEANING_STATES,
+            is_charging=current_mode in WebackWssCtrl.CHARGING_STATES,
+            error_info=status.get("error_info"),
+            battery_level=int(status.get("battery_level", 0)),
+            fan_status=fan_status,
+            mop_status=mop_status,
+            vacuum_or_mop=vacuum_or_mop,
+            clean_time=clean_time,
+            clean_area=clean_area,
+            volume=status.get("volume"),
+            voice=status.get("voice"),
+            undisturb_mode=status.get("undisturb_mode"),
+        )
+
 
 class VacDevice(WebackWssCtrl):
     """
@@ -30,19 +102,46 @@ class VacDevice(WebackWssCtrl):
         app,
         client_id,
         api_version,
+        heatmap_dir=None,
+        lazy_map=False,
+        auth_url=None,
+        metrics=False,
     ):
         _LOGGER.debug("WebackApi RobotController __init__")
-        super().__init__(user, password, region, country, app, client_id, api_version)
+        super().__init__(
+            user,
+            password,
+            region,
+            country,
+            app,
+            client_id,
+            api_version,
+            auth_url,
+        )
         self.name = thing_name
         self.nickname = thing_nickname
         self.sub_type = sub_type
         self.map = None
         self.map_image_buffer = None
+        self.map_revision = 0
+        self._rendered_map_revision = None
+        self.current_room = None
         self.map_camera = None
+        self.heatmap_dir = heatmap_dir
+        self.heatmap = None
+        self._heatmap_session = None
+        self._was_cleaning = False
+        self.lazy_map = lazy_map
+        # Map load of the first demand, awaited by every caller meanwhile
+        self._map_load = None
+        if metrics:
+            self.metrics = PipelineMetrics()
+            self.command_tracer = CommandTracer()
 
         # First init status from HTTP API
         if self.robot_status is None:
             self.robot_status = thing_status
+        self.status = VacStatus.from_thing_status(self.robot_status)
 
     # ==========================================================
     # Update controller
@@ -68,9 +167,30 @@ class VacDevice(WebackWssCtrl):
 
         # Some vacuums won't have hismap_id in the initial status, but will
         # report it later on. Let's make sure we try to load map again then.
-        if self.ACTIVE_MAP_ID_PROP in self.robot_status and not self.map:
+        # In lazy map mode, wait for the robot to clean or the map to be asked.
+        if (
+            self.ACTIVE_MAP_ID_PROP in self.robot_status
+            and not self.map
+            and (not self.lazy_map or self.is_cleaning)
+        ):
             asyncio.run(self.load_maps())
 
+        if self.heatmap is not None:
+            self._update_heatmap()
+        self._release_coverage()
+
+    def on_status_update(self):
+        self.status = VacStatus.from_thing_status(self.robot_status)
+
+    def on_map_update(self):
+        # A map_data frame has been merged, publish a new map revision
+        if self.map.revision == self._rendered_map_revision:
+            _LOGGER.debug("VacDevice: map is unchanged, skip rendering")
+            return
+        self.current_room = self.map.get_current_room()
+        self._open_heatmap()
+        self.render_map()
+
     async def load_maps(self):
         """Load the current reuse map"""
 
@@ -78,36 +198,127 @@ class VacDevice(WebackWssCtrl):
         if self.ACTIVE_MAP_ID_PROP not in self.robot_status:
             return False
 
+        # Robot may not have logged in yet to get its API URL
+        if not await self.check_credentials():
+            _LOGGER.error("VacDevice: can't load map, failed to obtain credentials")
+            return False
+
         map_data = await self.get_reuse_map_by_id(
             self.robot_status[self.ACTIVE_MAP_ID_PROP],
             self.sub_type,
             self.name,
         )
         if map_data:
-            self.map = VacMap(map_data)
-            self.render_map()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._load_map, map_data)
+
+    async def ensure_map(self):
+        """Load map on its first demand, if it wasn't yet (lazy map mode)"""
+        if self.map is not None:
+            return
+        if self._map_load is None:
+            _LOGGER.debug("VacDevice: map of %s is asked, loading it", self.name)
+            self._map_load = asyncio.get_running_loop().create_task(self.load_maps())
+            self._map_load.add_done_callback(self._map_loaded)
+        # A caller going away doesn't cancel the load for the others
+        await asyncio.shield(self._map_load)
+
+    def _map_loaded(self, task):
+        if self._map_load is task:
+            self._map_load = None
+
+    def _load_map(self, map_data):
+        """Decode and render map (blocking)"""
+        from .vacmap import VacMap  # noqa: PLC0415
+
+        self.map = VacMap(map_data, self.metrics)
+        self.current_room = self.map.get_current_room()
+        self._open_heatmap()
+        self.render_map()
+        self._release_coverage()
+
+    def _open_heatmap(self):
+        """Open heatmap file of the active map (blocking)"""
+        from .vacmap import VacMapHeatmap  # noqa: PLC0415
+
+        if not self.heatmap_dir or self.ACTIVE_MAP_ID_PROP not in self.robot_status:
+            return
+
+        path = os.path.join(
+            self.heatmap_dir,
+            f"{self.name}_{self.robot_status[self.ACTIVE_MAP_ID_PROP]}.heatmap",
+        )
+        if self.heatmap is None or self.heatmap.path != path:
+            if self.heatmap is not None:
+                self.heatmap.close()
+            self.heatmap = VacMapHeatmap(path)
+        self.heatmap.open((self.map.get_map_width(), self.map.get_map_height()))
+
+    def _update_heatmap(self):
+        """Add coverage of a cleaning to the heatmap once robot has finished it"""
+        cleaning = self.is_cleaning
+        if self._was_cleaning and not cleaning and self.map is not None:
+            coverage = self.map.coverage
+            # Masks are released once a cleaning is over and added to the heatmap
+            if (
+                coverage.mask is not None
+                and coverage.session != self._heatmap_session
+                and self.heatmap.add(coverage.mask)
+            ):
+                _LOGGER.debug("VacDevice: cleaning added to heatmap")
+                self._heatmap_session = coverage.session
+                self.render_map()
+        self._was_cleaning = cleaning
+
+    def _release_coverage(self):
+        """Coverage masks are only needed while cleaning (and by the heatmap)"""
+        if self.map is not None and not self.is_cleaning:
+            self.map.coverage.release()
 
     def render_map(self):
         """Rendering Map"""
         if not self.map:
             return False
 
+        with self.metrics.timer("render_map") as timer:
+            self._render_map()
+            timer.bytes_out = len(self.map_image_buffer)
+
+        if self.map_camera is not None:
+            self.trigger_map_camera_update()
+
+        return True
+
+    def _render_map(self):
+        from .vacmap import VacMapDraw  # noqa: PLC0415
+
+        self._rendered_map_revision = self.map.revision
         vac_map_draw = VacMapDraw(self.map)
+        if self.heatmap is not None:
+            vac_map_draw.draw_heatmap(self.heatmap)
         vac_map_draw.draw_charger_point()
         vac_map_draw.draw_path()
         vac_map_draw.draw_robot_position()
 
         img = vac_map_draw.get_image()
 
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format="PNG")
+        with self.metrics.timer("png_encode", img.width * img.height * 4) as timer:
+            img_byte_arr = io.BytesIO()
+            img.save(img_byte_arr, format="PNG")
+            timer.bytes_out = img_byte_arr.tell()
         img.close()
         self.map_image_buffer = img_byte_arr.getvalue()
-
-        if self.map_camera is not None:
-            self.trigger_map_camera_update()
-
-        return True
+        self.map_revision += 1
+
+    def get_diagnostics(self):
+        """Diagnostics of the robot: map pipeline timings, command round trips"""
+        return {
+            "thing_name": self.name,
+            "sub_type": self.sub_type,
+            "map_revision": self.map_revision,
+            "map_pipeline": self.metrics.summary(),
+            "commands": self.command_tracer.summary(),
+        }
 
     def register_map_camera(self, camera):
         """Register map camera"""
@@ -116,7 +327,7 @@ class VacDevice(WebackWssCtrl):
     def trigger_map_camera_update(self):
         """Trigger map camera update"""
         if self.map_camera is not None:
-            self.map_camera.schedule_update_ha_state(True)
+            self.map_camera.map_updated()
 
     # ==========================================================
     # Vacuum Entity
@@ -125,9 +336,7 @@ class VacDevice(WebackWssCtrl):
     @property
     def current_mode(self):
         """Raw working_status field string"""
-        if "working_status" in self.robot_status:
-            return self.robot_status["working_status"]
-        return self.IDLE_MODE
+        return self.status.current_mode
 
     @property
     def raw_status(self) -> str:
@@ -138,47 +347,37 @@ class VacDevice(WebackWssCtrl):
     @property
     def is_cleaning(self) -> bool:
         """Boolean define if robot is in cleaning state"""
-        _LOGGER.debug("is_cleaning = %s ", self.current_mode)
-        return self.current_mode in self.CLEANING_STATES
+        return self.status.is_cleaning
 
     @property
     def is_available(self):
         """Boolean define if robot is connected to cloud"""
-        connected = self.robot_status.get("connected")
-        return connected == "true" if connected is not None else False
+        return self.status.is_available
 
     @property
     def is_charging(self):
         """Boolean define if robot is charging"""
-        return self.current_mode in self.CHARGING_STATES
+        return self.status.is_charging
 
     @property
     def error_info(self):
         """Raw error_info field string"""
-        if "error_info" in self.robot_status:
-            return self.robot_status["error_info"]
-        return None
+        return self.status.error_info
 
     @property
     def battery_level(self):
         """Raw battery_level field integer"""
-        if "battery_level" in self.robot_status:
-            return int(self.robot_status["battery_level"])
-        return 0
+        return self.status.battery_level
 
     @property
     def fan_status(self):
         """Raw fan_status field string"""
-        if "fan_status" in self.robot_status:
-            return self.robot_status["fan_status"]
-        return None
+        return self.status.fan_status
 
     @property
     def mop_status(self):
-        """Raw fan_status field string"""
-        if "water_level" in self.robot_status:
-            return self.robot_status["water_level"]
-        return None
+        """Raw water_level field string"""
+        return self.status.mop_status
 
     @property
     def fan_speed_list(self):
@@ -193,28 +392,24 @@ class VacDevice(WebackWssCtrl):
     @property
     def clean_time(self):
         """Return clean time"""
-        if "clean_time" in self.robot_status:
-            return self.robot_status["clean_time"]
-        return 0
+        return self.status.clean_time or 0
 
     @property
     def clean_area(self):
         """Return clean area in square meter"""
-        if "clean_area" in self.robot_status:
-            return self.robot_status["clean_area"]
-        return 0
+        return self.status.clean_area or 0
+
+    @property
+    def room_coverage(self):
+        """Return cleaned area and coverage of each room"""
+        if self.map is None:
+            return {}
+        return self.map.get_room_coverage()
 
     @property
     def vacuum_or_mop(self) -> int:
         """Find if the robot is in vacuum or mop mode"""
-        if "fan_status" and "water_level" in self.robot_status:
-            if (
-                self.robot_status["fan_status"] == self.FAN_DISABLED
-                and self.robot_status["water_level"] != self.MOP_DISABLED
-            ):
-                return self.MOP_ON
-            return self.VACUUM_ON
-        return self.NO_FAN_NO_MOP
+        return self.status.vacuum_or_mop
 
     # ==========================================================
     # Vacuum Entity
@@ -276,6 +471,11 @@ class VacDevice(WebackWssCtrl):
         }
         await self.send_command(self.name, self.sub_type, working_payload)
 
+    async def goto_target(self, point):
+        """GoTo command for a point in map card coordinates"""
+        x, y = CARD_TO_COMMAND.point(point[0], point[1])
+        await self.goto([int(x), int(y)])
+
     async def clean_rect(self, rectangle: str):
         """Clean rectangle command"""
         working_payload = {
@@ -313,19 +513,15 @@ class VacDevice(WebackWssCtrl):
 
     async def clean_zone(self, bounding):
         """Clean zone command"""
-        box_x = []
-        box_y = []
         num_boxes = len(bounding)
 
-        for box in bounding:
-            box_x.append(int(box[0] / 10))
-            box_x.append(int(box[0] / 10))
-            box_x.append(int(box[2] / 10))
-            box_x.append(int(box[2] / 10))
-            box_y.append(int(box[1] / 10))
-            box_y.append(int(box[3] / 10))
-            box_y.append(int(box[3] / 10))
-            box_y.append(int(box[1] / 10))
+        # Each box [x1, y1, x2, y2] becomes its 4 corners
+        corners = CARD_TO_COMMAND.points(
+            [x for box in bounding for x in (box[0], box[0], box[2], box[2])],
+            [y for box in bounding for y in (box[1], box[3], box[3], box[1])],
+        )
+        box_x = [int(x) for x, _ in corners]
+        box_y = [int(y) for _, y in corners]
 
         working_payload = {
             self.ASK_STATUS: self.ROBOT_PLANNING_RECT,
@@ -1,17 +1,31 @@
-import base64
+import binascii
 import io
-import json
-import random
+import mmap
+import os
+import re
 import struct
+import uuid
 import zlib
+from array import array
 
-from PIL import Image, ImageDraw, ImageOps
+from PIL import Image, ImageChops, ImageDraw, ImageMath, ImageOps
+
+from .maptransform import VacMapTransform
+from .metrics import NULL_METRICS
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# Base64 characters decoded (and bytes inflated) at once, a multiple of 4
+DECODE_CHUNK_SIZE = 64 * 1024
 
 
 class VacMapDraw:
-    def __init__(self, vac_map):
+    def __init__(self, vac_map, img=None):
         self.vac_map = vac_map
-        self.img = self.vac_map.get_map_image()
+        self.img = img if img is not None else self.vac_map.get_map_image()
         self.draw = ImageDraw.Draw(self.img, "RGBA")
 
     def draw_charger_point(self, col=(0x1C, 0xE3, 0x78, 0xFF), radius=10):
@@ -36,45 +50,221 @@ class VacMapDraw:
         )
         self.draw.ellipse(coords, col, col)
 
+    def draw_heatmap(self, heatmap):
+        layer = heatmap.get_layer()
+        if layer is not None:
+            scale = self.vac_map.map_scale
+            self.img.alpha_composite(
+                layer.resize(
+                    (layer.width * scale, layer.height * scale),
+                    Image.NEAREST,
+                ).convert("RGBA"),
+            )
+
     def draw_room(self, room):
         self.draw.polygon(
-            self.vac_map._virtual_to_pixel_list(room.get_room_bounds()),
-            tuple(random.choices(range(256), k=4)),  # noqa: S311
+            self.vac_map.virtual_to_pixel.points_rounded(
+                room.geometry.xs,
+                room.geometry.ys,
+            ),
+            room.get_room_color(),
             (255, 255, 0, 128),
         )
 
     def draw_rooms(self):
-        rooms = self.vac_map.get_rooms()
-        for room in rooms:
-            self.draw_room(room)
+        self.img.alpha_composite(self.vac_map.get_room_layer())
 
     def draw_path(self, col=(0x1C, 0xE3, 0xDA, 0xFF), invisible_relocate=True):
+        path_data = self.vac_map.path_data
+        with self.vac_map.metrics.timer(
+            "draw_path",
+            len(path_data) * path_data.itemsize if path_data is not None else 0,
+        ):
+            self._draw_path(col, invisible_relocate)
+
+    def _draw_path(self, col, invisible_relocate):
         path, point_types = self.vac_map.get_path()
 
-        last_coord = None
+        # Consecutive segments of the same color are drawn as one polyline,
+        # skipping points which fall on the same pixel as the previous one
+        polyline = path[:1]
+        polyline_col = None
+        for i in range(1, len(path)):
+            if point_types[i] == VacMap.PATH_VACUUMING:
+                segment_col = col
+            elif invisible_relocate:
+                segment_col = None
+            else:
+                segment_col = (255, 255, 255, 0)
 
-        for i, coord in enumerate(path):
-            if not last_coord:
-                last_coord = coord
-                continue
+            if segment_col != polyline_col:
+                self._draw_polyline(polyline, polyline_col)
+                polyline = [path[i - 1]]
+                polyline_col = segment_col
+            if polyline_col is not None and path[i] != polyline[-1]:
+                polyline.append(path[i])
 
-            point_type = point_types[i]
-            if point_type == VacMap.PATH_VACUUMING or invisible_relocate is False:
-                self.draw.line(
-                    (last_coord, coord),
-                    col if point_type == VacMap.PATH_VACUUMING else (255, 255, 255, 0),
-                    width=3,
-                )
+        self._draw_polyline(polyline, polyline_col)
 
-            last_coord = coord
+    def _draw_polyline(self, polyline, col):
+        if col is not None and len(polyline) > 1:
+            self.draw.line(polyline, col, width=3)
 
     def get_image(self):
         return self.img
 
 
+def decode_map_payload(data_input, max_size, metrics=NULL_METRICS):
+    """
+    Decode a base64 zlib compressed JSON map payload chunk by chunk, failing
+    as soon as decompressed data goes over max_size bytes
+    """
+    with metrics.timer("decompress", len(data_input)) as timer:
+        decompressed = _decompress_map_payload(data_input, max_size)
+        timer.bytes_out = len(decompressed)
+    with metrics.timer("parse", len(decompressed)):
+        return json_loads(decompressed)
+
+
+def _decompress_map_payload(data_input, max_size):
+    decompressor = zlib.decompressobj()
+    decompressed = bytearray()
+    for start in range(0, len(data_input), DECODE_CHUNK_SIZE):
+        compressed = binascii.a2b_base64(
+            data_input[start : start + DECODE_CHUNK_SIZE],
+        )
+        # Inflate by bounded steps, so no big temporary copy is made
+        while compressed:
+            decompressed += decompressor.decompress(compressed, DECODE_CHUNK_SIZE)
+            compressed = decompressor.unconsumed_tail
+            if len(decompressed) > max_size:
+                msg = f"Map payload is bigger than {max_size} bytes once decompressed"
+                raise ValueError(msg)
+    decompressed += decompressor.flush()
+    if not decompressor.eof:
+        msg = "Map payload is truncated"
+        raise ValueError(msg)
+    return decompressed
+
+
+# Packed map byte (4 cells of 2 bits) to its 4 grayscale pixels
+_BITMAP_WHITE = 255
+_BITMAP_LUT = [
+    bytes(((byte >> shift) & 3) * 85 for shift in (6, 4, 2, 0)) for byte in range(256)
+]
+
+# Packed path types byte (4 points of 2 bits) to its 4 point types
+_POINT_TYPE_LUT = [
+    bytes((byte << shift) & 192 for shift in (0, 2, 4, 6)) for byte in range(256)
+]
+
+
+def point_in_polygon(x, y, xs, ys):
+    """Even-odd rule test of (x,y) against the polygon given by xs/ys"""
+    inside = False
+    j = len(xs) - 1
+    for i in range(len(xs)):
+        if (ys[i] > y) != (ys[j] > y) and x < (xs[j] - xs[i]) * (y - ys[i]) / (
+            ys[j] - ys[i]
+        ) + xs[i]:
+            inside = not inside
+        j = i
+    return inside
+
+
+class VacMapRoomGeometry:
+    """Room polygon and its derived values, computed once per loaded map"""
+
+    __slots__ = ("area", "bbox", "centroid", "label_anchor", "points", "xs", "ys")
+
+    def __init__(self, room_point_x, room_point_y):
+        self.xs = array("i", room_point_x)
+        self.ys = array("i", room_point_y)
+        self.points = tuple(zip(self.xs, self.ys, strict=True))
+        self.bbox = (min(self.xs), min(self.ys), max(self.xs), max(self.ys))
+
+        # Shoelace formula for signed area and polygon centroid
+        area = cx = cy = 0
+        count = len(self.xs)
+        for i in range(count):
+            x0, y0 = self.xs[i], self.ys[i]
+            x1, y1 = self.xs[(i + 1) % count], self.ys[(i + 1) % count]
+            cross = x0 * y1 - x1 * y0
+            area += cross
+            cx += (x0 + x1) * cross
+            cy += (y0 + y1) * cross
+
+        bbox_center = (
+            (self.bbox[0] + self.bbox[2]) / 2,
+            (self.bbox[1] + self.bbox[3]) / 2,
+        )
+        if area:
+            self.centroid = (cx / (3 * area), cy / (3 * area))
+        else:
+            self.centroid = bbox_center
+        self.area = abs(area) / 2
+
+        # Centroid of a concave room can fall outside of it
+        if point_in_polygon(*self.centroid, self.xs, self.ys):
+            self.label_anchor = self.centroid
+        else:
+            self.label_anchor = bbox_center
+
+
+class VacMapRoomIndex:
+    """Uniform grid over room bounding boxes, to find the room under a point"""
+
+    __slots__ = ("_buckets", "_cell_size", "_last_room")
+
+    def __init__(self, rooms, divisions=16):
+        self._buckets = {}
+        self._cell_size = 1
+        self._last_room = None
+
+        if not rooms:
+            return
+
+        boxes = [room.geometry.bbox for room in rooms]
+        span = max(
+            max(box[2] for box in boxes) - min(box[0] for box in boxes),
+            max(box[3] for box in boxes) - min(box[1] for box in boxes),
+        )
+        self._cell_size = max(span / divisions, 1)
+
+        for room, (x0, y0, x1, y1) in zip(rooms, boxes, strict=True):
+            for cell_x in range(self._cell(x0), self._cell(x1) + 1):
+                for cell_y in range(self._cell(y0), self._cell(y1) + 1):
+                    self._buckets.setdefault((cell_x, cell_y), []).append(room)
+
+    def _cell(self, value):
+        return int(value // self._cell_size)
+
+    @staticmethod
+    def _contains(room, x, y):
+        geometry = room.geometry
+        x0, y0, x1, y1 = geometry.bbox
+        return (
+            x0 <= x <= x1
+            and y0 <= y <= y1
+            and point_in_polygon(x, y, geometry.xs, geometry.ys)
+        )
+
+    def find(self, x, y):
+        # Robot usually stays in the same room between two updates
+        if self._last_room is not None and self._contains(self._last_room, x, y):
+            return self._last_room
+
+        for room in self._buckets.get((self._cell(x), self._cell(y)), ()):
+            if self._contains(room, x, y):
+                self._last_room = room
+                return room
+        return None
+
+
 class VacMapRoom:
     def __init__(self, data):
         self.data = data
+        self._geometry = None
 
     def get_clean_times(self):
         return self.data["clean_times"]
@@ -90,24 +280,26 @@ class VacMapRoom:
             return self.data["room_name"]
         return None
 
-    def get_room_bounds(self, use_tuple=True):
-        bounds = []
-        for x, y in zip(self.data["room_point_x"], self.data["room_point_y"]):
-            if use_tuple:
-                bounds.append((x, y))
-            else:
-                bounds.append([x, y])
-        return bounds
+    def get_room_color(self):
+        """RGBA colour of the room, always the same for a given room id"""
+        return tuple(zlib.crc32(str(self.get_room_id()).encode()).to_bytes(4, "big"))
 
-    def get_room_label_offset(self):
-        bounds = self.get_room_bounds()
+    @property
+    def geometry(self):
+        if self._geometry is None:
+            self._geometry = VacMapRoomGeometry(
+                self.data["room_point_x"],
+                self.data["room_point_y"],
+            )
+        return self._geometry
 
-        min_coord = min(bounds)[0], min(bounds)[1]
-        max_coord = max(bounds)[0], max(bounds)[1]
+    def get_room_bounds(self, use_tuple=True):
+        if use_tuple:
+            return self.geometry.points
+        return [list(point) for point in self.geometry.points]
 
-        return min_coord[0] + ((max_coord[0] - min_coord[0]) / 2), min_coord[1] + (
-            (max_coord[1] - min_coord[1]) / 2
-        )
+    def get_room_label_offset(self):
+        return self.geometry.label_anchor
 
     def get_xaiomi_vacuum_map_card_rooms(self):
         label_offset = self.get_room_label_offset()
@@ -122,6 +314,472 @@ class VacMapRoom:
         }
 
 
+class VacMapCoverage:
+    """
+    Cells swept by the brush during the current cleaning, drawn incrementally
+    onto a map sized mask as path points arrive. Masks can be released when
+    no cleaning is going on, they are redrawn if the path goes on.
+    """
+
+    def __init__(self):
+        self.mask = None
+        self.session = 0
+        self.rooms = {}
+        self._draw = None
+        self._path = array("h")
+        self._size = None
+        self._transform = None
+        self._rooms = None
+        self._room_masks = []
+
+    def _reset(self, size, transform):
+        self.session += 1
+        self._size = size
+        self._transform = transform
+        self._new_mask()
+
+    def _new_mask(self):
+        self.mask = Image.new("L", self._size, 0)
+        self._draw = ImageDraw.Draw(self.mask)
+        self._path = array("h")
+        self._rooms = None
+
+    def release(self):
+        """Drop masks (room stats are kept), until the path goes on"""
+        self.mask = None
+        self._draw = None
+        self._rooms = None
+        self._room_masks = []
+
+    def _draw_polyline(self, polyline, width):
+        if len(polyline) > 1:
+            self._draw.line(polyline, 255, width=width, joint="curve")
+
+    def update(self, vac_map):
+        """Draw path points received since last update, then refresh room stats"""
+        size = (vac_map.get_map_width(), vac_map.get_map_height())
+        transform = vac_map.virtual_to_cell
+        path = vac_map.path_data if vac_map.path_data is not None else array("h")
+        point_count = len(path) // 2
+        done = len(self._path) // 2
+
+        # Map changed or path restarted: this is a new cleaning
+        if (
+            self._size != size
+            or self._transform != transform
+            or point_count < done
+            or path[: done * 2] != self._path[: done * 2]
+        ):
+            self._reset(size, transform)
+            done = 0
+        elif self.mask is None:
+            # Released: stay so until the same cleaning goes on, then redraw it
+            if point_count == done:
+                return False
+            self._new_mask()
+            done = 0
+
+        if point_count == done and self._rooms == vac_map.get_rooms():
+            return False
+
+        width = max(1, round(vac_map.BRUSH_WIDTH / vac_map.MAP_CELL_SIZE))
+
+        # Restart from the last drawn point to link new segments to the path
+        first = max(done - 1, 0)
+        cells = transform.points(path[first * 2 :: 2], path[first * 2 + 1 :: 2])
+        polyline = []
+        for index, cell in enumerate(cells, first):
+            # Type of a point tells how the robot moved to reach it
+            # (index is shifted by the charger point heading the path)
+            if polyline and vac_map.get_point_type(index + 1) != vac_map.PATH_VACUUMING:
+                self._draw_polyline(polyline, width)
+                polyline = []
+            polyline.append(cell)
+        self._draw_polyline(polyline, width)
+        self._path = path
+
+        self._update_rooms(vac_map, transform)
+        return True
+
+    def _update_rooms(self, vac_map, transform):
+        rooms = vac_map.get_rooms()
+        if rooms != self._rooms:
+            self._rooms = rooms
+            self._room_masks = [
+                self._room_mask(room, transform, self.mask.size) for room in rooms
+            ]
+
+        cell_area = vac_map.MAP_CELL_SIZE**2
+        self.rooms = {}
+        for room, box, mask, cells in self._room_masks:
+            if not cells:
+                continue
+            covered = ImageChops.multiply(self.mask.crop(box), mask).histogram()[255]
+            self.rooms[room.get_room_id()] = {
+                "name": room.get_room_name(),
+                "cleaned_area": round(covered * cell_area, 1),
+                "coverage": round(covered * 100 / cells),
+            }
+
+    @staticmethod
+    def _room_mask(room, transform, size):
+        """Rasterise room polygon over its bounding box"""
+        x0, y0, x1, y1 = room.geometry.bbox
+        (x0, y0), (x1, y1) = transform.points((x0, x1), (y0, y1))
+        box = (
+            max(int(x0), 0),
+            max(int(y0), 0),
+            min(int(x1) + 1, size[0]),
+            min(int(y1) + 1, size[1]),
+        )
+        if box[0] >= box[2] or box[1] >= box[3]:
+            return room, box, None, 0
+
+        # Polygon relative to the box
+        to_box = transform.then(VacMapTransform(1, 1, -box[0], -box[1]))
+        mask = Image.new("L", (box[2] - box[0], box[3] - box[1]), 0)
+        ImageDraw.Draw(mask).polygon(
+            to_box.points(room.geometry.xs, room.geometry.ys),
+            255,
+        )
+        return room, box, mask, mask.histogram()[255]
+
+
+class VacMapHeatmap:
+    """
+    Count of cleanings which went over each map cell, accumulated across
+    cleanings into a memory mapped file of uint16 cells
+    """
+
+    HEADER = struct.Struct("<4sII")
+    MAGIC = b"WBHM"
+    MAX_COUNT = 0xFFFF
+
+    def __init__(self, path):
+        self.path = path
+        self.size = None
+        self.counts = None
+        self.max_count = 0
+        self.revision = 0
+        self._file = None
+        self._mmap = None
+        self._layer = (None, None)
+
+    def open(self, size):
+        """Open (or create) heatmap file for a map of given size"""
+        if self.size == size and self.counts is not None:
+            return
+        self.close()
+
+        length = self.HEADER.size + size[0] * size[1] * 2
+        header = self.HEADER.pack(self.MAGIC, *size)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a+b")  # noqa: SIM115
+        self._file.seek(0)
+        if self._file.read(self.HEADER.size) != header:
+            # Unknown file or map has been resized, start a new heatmap
+            self._file.truncate(0)
+            self._file.write(header)
+        self._file.truncate(length)
+        self._file.flush()
+
+        self._mmap = mmap.mmap(self._file.fileno(), length)
+        self.counts = memoryview(self._mmap)[self.HEADER.size :].cast("H")
+        self.size = size
+        self.max_count = self._counts_image().getextrema()[1]
+        self.revision += 1
+
+    def close(self):
+        if self.counts is not None:
+            self.counts.release()
+            self.counts = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.size = None
+
+    def add(self, mask):
+        """Add cells covered by a cleaning (non zero cells of mask)"""
+        if self.counts is None or mask.size != self.size:
+            return False
+
+        # Add 1 where mask is set, in 32 bits to clamp counts before storing them
+        counts = ImageMath.lambda_eval(
+            lambda args: args["min"](
+                args["counts"] + (args["mask"] != 0),
+                self.MAX_COUNT,
+            ),
+            counts=self._counts_image().convert("I"),
+            mask=mask,
+        ).convert("I;16")
+        self.counts.cast("B")[:] = counts.tobytes("raw", "I;16")
+        self.max_count = counts.getextrema()[1]
+        counts.close()
+        self._mmap.flush()
+        self.revision += 1
+        return True
+
+    def _counts_image(self):
+        """Counts as a 16 bits image, sharing the file memory"""
+        return Image.frombuffer(
+            "I;16",
+            self.size,
+            self.counts.cast("B"),
+            "raw",
+            "I;16",
+            0,
+            1,
+        )
+
+    def get_layer(self, low=(0xFF, 0xEB, 0x3B), high=(0xD3, 0x2F, 0x2F)):
+        """
+        Overlay of the heatmap at one pixel per cell, as a paletted image
+        rebuilt only when heatmap has changed: convert it to RGBA once resized
+        """
+        if self.counts is None or not self.max_count:
+            return None
+        if self._layer[0] == (self.revision, low, high):
+            return self._layer[1]
+
+        # Index 0 is transparent (cells never cleaned), 1 to 255 go from low
+        # to high heat
+        counts = self._counts_image()
+        heat = counts.point(lambda v: v * (254 / self.max_count) + 1).convert("L")
+        cleaned = counts.point(lambda v: v * 255).convert("L")
+        layer = Image.new("L", self.size)
+        layer.paste(heat, mask=cleaned)
+
+        gradient = Image.frombytes("L", (256, 1), bytes(range(256)))
+        colors = ImageOps.colorize(gradient, low, high).tobytes()
+        palette = bytearray(4)
+        for index in range(1, 256):
+            value = (index - 1) * 255 // 254
+            palette += colors[value * 3 : value * 3 + 3]
+            palette.append(160)
+        layer.putpalette(palette, "RGBA")
+        self._layer = ((self.revision, low, high), layer)
+        return layer
+
+
+class VacMapTiles:
+    """
+    Map grid and cleaning path rendered as a pyramid of square PNG tiles,
+    zoom level z being 2^z pixels per map cell. Tiles are rendered on demand
+    and kept until the part of the map they show changes
+    """
+
+    TILE_SIZE = 256
+    # Side of the squares path segments are indexed by, in map cells
+    BUCKET_SIZE = 64
+    PATH_WIDTH = 3
+
+    def __init__(self):
+        self.max_zoom = 0
+        self._tiles = {}
+        self._epoch = 0
+        self._session = None
+        # Path index, only built once a tile is asked: count of path points
+        # indexed (charger point first) and vacuuming segments per bucket.
+        # Points are taken back from the map path data when drawn
+        self._indexed = None
+        self._buckets = {}
+
+    def update(self, vac_map, changed):
+        """Drop tiles showing changed parts of the map"""
+        self.max_zoom = vac_map.map_scale.bit_length() - 1
+        self._epoch += 1
+
+        if (
+            "grid" in changed
+            or "origin" in changed
+            or vac_map.path_session != self._session
+        ):
+            self._tiles = {}
+            self._session = vac_map.path_session
+            self._indexed = None
+            self._buckets = {}
+        elif "path" in changed and self._indexed is not None:
+            for box in self._extend_path(vac_map):
+                self._invalidate(box)
+
+    def _index_path(self, vac_map):
+        """Index the whole path, unless the map changes meanwhile"""
+        epoch = self._epoch
+        tiles = VacMapTiles()
+        tiles._indexed = 0
+        tiles._extend_path(vac_map)
+        if epoch == self._epoch:
+            self._indexed, self._buckets = tiles._indexed, tiles._buckets
+
+    @staticmethod
+    def _cell_points(vac_map, start, end):
+        """Path points start to end (excluded) in map cells, charger point first"""
+        points = []
+        if start == 0:
+            points.append(
+                (
+                    vac_map.charger_point[0] + vac_map.map_origin[0],
+                    vac_map.charger_point[1] + vac_map.map_origin[1],
+                ),
+            )
+            start = 1
+        path = vac_map.path_data
+        points.extend(
+            vac_map.virtual_to_cell.points(
+                path[(start - 1) * 2 : (end - 1) * 2 : 2],
+                path[(start - 1) * 2 + 1 : (end - 1) * 2 : 2],
+            ),
+        )
+        return points
+
+    def _extend_path(self, vac_map):
+        """Index new path points, return boxes of new visible segments"""
+        path = vac_map.path_data
+        if path is None:
+            return []
+        first = self._indexed
+        count = len(path) // 2 + 1
+        if count <= first:
+            return []
+        types = vac_map.get_point_types(count)
+        # Segment i goes from point i - 1 to point i
+        start = max(first - 1, 0)
+        points = self._cell_points(vac_map, start, count)
+
+        boxes = []
+        for segment in range(max(first, 1), count):
+            if types[segment] != vac_map.PATH_VACUUMING:
+                continue
+            x0, y0, x1, y1 = box = self._segment_box(
+                points[segment - 1 - start],
+                points[segment - start],
+            )
+            for bucket_x in range(
+                int(x0 // self.BUCKET_SIZE),
+                int(x1 // self.BUCKET_SIZE) + 1,
+            ):
+                for bucket_y in range(
+                    int(y0 // self.BUCKET_SIZE),
+                    int(y1 // self.BUCKET_SIZE) + 1,
+                ):
+                    self._buckets.setdefault(
+                        (bucket_x, bucket_y),
+                        array("I"),
+                    ).append(segment)
+            boxes.append(box)
+        self._indexed = count
+        return boxes
+
+    def _segment_box(self, point0, point1):
+        """Cells box a segment can be drawn over, whatever the zoom level"""
+        (x0, y0), (x1, y1) = point0, point1
+        return (
+            min(x0, x1) - self.PATH_WIDTH,
+            min(y0, y1) - self.PATH_WIDTH,
+            max(x0, x1) + self.PATH_WIDTH,
+            max(y0, y1) + self.PATH_WIDTH,
+        )
+
+    def _invalidate(self, box):
+        x0, y0, x1, y1 = box
+        for zoom in range(self.max_zoom + 1):
+            cells = self.TILE_SIZE >> zoom
+            for x in range(int(x0 // cells), int(x1 // cells) + 1):
+                for y in range(int(y0 // cells), int(y1 // cells) + 1):
+                    self._tiles.pop((zoom, x, y), None)
+
+    def get_tile(self, vac_map, zoom, x, y):
+        """PNG tile (zoom, x, y), None if it is out of the map"""
+        if not 0 <= zoom <= self.max_zoom:
+            return None
+        cells = self.TILE_SIZE >> zoom
+        if not (
+            0 <= x < -(-vac_map.get_map_width() // cells)
+            and 0 <= y < -(-vac_map.get_map_height() // cells)
+        ):
+            return None
+
+        tile = self._tiles.get((zoom, x, y))
+        if tile is not None:
+            return tile
+
+        # Map may change while the tile is rendered, then it is not kept
+        epoch = self._epoch
+        if self._indexed is None:
+            self._index_path(vac_map)
+        box = (x * cells, y * cells, (x + 1) * cells, (y + 1) * cells)
+        # Paletted grid is cropped within the map, the rest stays transparent
+        base_image = vac_map.get_base_image()
+        img = Image.new("RGBA", (cells, cells))
+        img.paste(
+            base_image.crop(
+                (
+                    *box[:2],
+                    min(box[2], base_image.width),
+                    min(box[3], base_image.height),
+                ),
+            ).convert("RGBA"),
+        )
+        img = img.resize((self.TILE_SIZE, self.TILE_SIZE), Image.NEAREST)
+        self._draw_path(vac_map, img, zoom, box)
+
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        tile = buffer.getvalue()
+        if epoch == self._epoch:
+            self._tiles[(zoom, x, y)] = tile
+        return tile
+
+    def _draw_path(self, vac_map, img, zoom, box):
+        if self._indexed is None or vac_map.path_data is None:
+            return
+        segments = set()
+        for bucket_x in range(
+            box[0] // self.BUCKET_SIZE,
+            (box[2] - 1) // self.BUCKET_SIZE + 1,
+        ):
+            for bucket_y in range(
+                box[1] // self.BUCKET_SIZE,
+                (box[3] - 1) // self.BUCKET_SIZE + 1,
+            ):
+                segments.update(self._buckets.get((bucket_x, bucket_y), ()))
+        if not segments:
+            return
+
+        scale = 1 << zoom
+        offset = (box[0] * scale, box[1] * scale)
+        draw = ImageDraw.Draw(img, "RGBA")
+        # Consecutive segments are drawn as a polyline of points start to end
+        start = end = None
+        for segment in sorted(segments):
+            if end is not None and segment != end:
+                self._draw_polyline(draw, vac_map, range(start, end), scale, offset)
+                start = None
+            if start is None:
+                start = segment - 1
+            end = segment + 1
+        self._draw_polyline(draw, vac_map, range(start, end), scale, offset)
+
+    def _draw_polyline(self, draw, vac_map, polyline, scale, offset):
+        # Path may be replaced meanwhile: then fewer points are drawn, and
+        # the tile isn't kept
+        cells = self._cell_points(vac_map, polyline.start, polyline.stop)
+        points = []
+        for index, (x, y) in enumerate(cells, polyline.start):
+            if index > 0:
+                # Path points are rounded to pixels, not the charger point
+                point = (round(x * scale), round(y * scale))
+            else:
+                point = (x * scale, y * scale)
+            points.append((point[0] - offset[0], point[1] - offset[1]))
+        if len(points) > 1:
+            draw.line(points, (0x1C, 0xE3, 0xDA, 0xFF), width=self.PATH_WIDTH)
+
+
 class VacMap:
     MAP_FORMAT_YW_LASER = "yw_ls"
     MAP_FORMAT_YW_VISUAL = "yw_vs"
@@ -134,118 +792,335 @@ class VacMap:
     PATH_RELOCATING = 0x40
     PATH_VACUUMING = 0x0
 
-    def __init__(self, data_input):
+    # Maximum size of a decompressed map payload, in bytes
+    MAX_PAYLOAD_SIZE = 16 * 1024 * 1024
+
+    # Size of a map cell and width swept by the brush, in meters
+    MAP_CELL_SIZE = 0.05
+    BRUSH_WIDTH = 0.2
+
+    # Parts of the payload which are decoded and rebuilt independently
+    MAP_PARTS = ("grid", "origin", "rooms", "path")
+
+    __slots__ = (
+        "_base_image",
+        "_cache",
+        "_changed_at",
+        "_fingerprints",
+        "_room_index",
+        "_rooms_by_id",
+        "_rooms_by_name",
+        "charger_point",
+        "coverage",
+        "map_data",
+        "map_height",
+        "map_id",
+        "map_origin",
+        "map_resolution",
+        "map_scale",
+        "map_width",
+        "metrics",
+        "path_data",
+        "path_session",
+        "point_types",
+        "revision",
+        "revisions",
+        "room_zone_info",
+        "tiles",
+        "virtual_to_cell",
+        "virtual_to_pixel",
+    )
+
+    def __init__(self, data_input, metrics=None):
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        # Revisions and path sessions restart with each instance (HA restart,
+        # map reload): clients tell which map their state comes from
+        self.map_id = uuid.uuid4().hex
+        self.map_scale = 4
+        self.coverage = VacMapCoverage()
+        self.tiles = VacMapTiles()
+        self.revision = 0
+        self.revisions = dict.fromkeys(self.MAP_PARTS, 0)
+        self._fingerprints = {}
+        self._changed_at = dict.fromkeys(self.MAP_PARTS, 0)
+        self._cache = {}
+        self._base_image = None
+        self._rooms_by_id = {}
+        self._rooms_by_name = {}
+        self._room_index = None
+        self.path_data = None
+        self.path_session = 0
+        self.point_types = b""
         self.load_data(data_input)
 
     def load_data(self, data_input):
-        self.data = json.loads(zlib.decompress(base64.b64decode(data_input)))
-        self.map_data = bytearray(base64.b64decode(self.data["MapData"]))
-        self.map_bitmap = False
-        self.map_scale = 4
-        if "PointData" in self.data:
-            self.data["PointData"] = base64.b64decode(self.data["PointData"])
-            self.data["PointType"] = base64.b64decode(self.data["PointType"])
+        """Load a map payload, return the parts which have changed"""
+        changed = self._decode(data_input)
+        if "rooms" in changed:
+            self._index_rooms()
+        self._update(changed)
+        return changed
+
+    def _changed(self, part, fingerprint):
+        """Record fingerprint of a payload part, tell if it is a new one"""
+        if part in self._fingerprints and self._fingerprints[part] == fingerprint:
+            return False
+        self._fingerprints[part] = fingerprint
+        self.revisions[part] += 1
+        return True
+
+    def _cached(self, name, parts, build):
+        """
+        Value built once per revision of the payload parts it depends on,
+        the same object is returned as long as they are unchanged
+        """
+        key = tuple(self.revisions[part] for part in parts)
+        cached = self._cache.get(name)
+        if cached is None or cached[0] != key:
+            cached = self._cache[name] = (key, build())
+        return cached[1]
 
-    def wss_update(self, data_input):
-        existing_room_data = self.data["room_zone_info"]
+    def _decode(self, data_input):
+        """
+        Decode the parts of the payload which have changed. Raw strings are
+        released once parsed, grid stays packed (4 cells per byte)
+        """
+        data = decode_map_payload(data_input, self.MAX_PAYLOAD_SIZE, self.metrics)
+        changed = set()
+
+        map_data = data.pop("MapData")
+        if self._changed("grid", (data["MapWidth"], data["MapHigh"], hash(map_data))):
+            self.map_width = int(data["MapWidth"])
+            self.map_height = int(data["MapHigh"])
+            self.map_data = binascii.a2b_base64(map_data)
+            changed.add("grid")
+        del map_data
+
+        if self._changed(
+            "origin",
+            (
+                data["MapResolution"],
+                *data["MapOrigin"][:2],
+                *data["ChargerPoint"][:2],
+            ),
+        ):
+            self.map_resolution = data["MapResolution"]
+            self.map_origin = (data["MapOrigin"][0], data["MapOrigin"][1])
+            self.charger_point = (data["ChargerPoint"][0], data["ChargerPoint"][1])
+            # Virtual (laser) coordinates to map cells, then to image pixels
+            self.virtual_to_cell = VacMapTransform(
+                2 * self.map_resolution,
+                2 * self.map_resolution,
+                *self.map_origin,
+            )
+            self.virtual_to_pixel = self.virtual_to_cell.then(
+                VacMapTransform(self.map_scale, self.map_scale),
+            )
+            changed.add("origin")
 
-        self.load_data(data_input)
+        rooms = data.get("room_zone_info") or []
+        if self._changed(
+            "rooms",
+            hash(
+                tuple(
+                    (
+                        room["room_id"],
+                        room.get("room_name"),
+                        tuple(room["room_point_x"]),
+                        tuple(room["room_point_y"]),
+                    )
+                    for room in rooms
+                ),
+            ),
+        ):
+            self.room_zone_info = rooms
+            changed.add("rooms")
+
+        point_data = data.pop("PointData", None)
+        point_types = data.pop("PointType", None)
+        if self._changed("path", hash((point_data, point_types))):
+            previous_path = self.path_data
+            self.path_data = None
+            self.point_types = b""
+            if point_data is not None:
+                # Path is a sequence of (x, y) int16 virtual coordinates
+                point_data = binascii.a2b_base64(point_data)
+                self.path_data = array("h")
+                self.path_data.frombytes(
+                    memoryview(point_data)[: len(point_data) // 4 * 4],
+                )
+                self.point_types = binascii.a2b_base64(point_types)
+            # New path session unless points were only appended to the path
+            if (
+                previous_path is None
+                or self.path_data is None
+                or self.path_data[: len(previous_path)] != previous_path
+            ):
+                self.path_session += 1
+            changed.add("path")
+
+        return changed
+
+    def _update(self, changed):
+        """Rebuild what depends on the changed parts"""
+        if not changed:
+            return
+        self.revision += 1
+        for part in changed:
+            self._changed_at[part] = self.revision
+        if "grid" in changed:
+            self._base_image = None
+        with self.metrics.timer("map_update"):
+            self.coverage.update(self)
+            self.tiles.update(self, changed)
+
+    def _index_rooms(self):
+        """Index rooms by id and by name, once per rooms revision"""
+        self._rooms_by_id = {}
+        self._rooms_by_name = {}
+        self._room_index = None
+        for room in self.room_zone_info:
+            vac_map_room = VacMapRoom(room)
+            self._rooms_by_id[room["room_id"]] = vac_map_room
+            if "room_name" in room:
+                self._rooms_by_name[room["room_name"]] = vac_map_room
 
-        for i, room in enumerate(self.data["room_zone_info"]):
-            existing_room = next(
-                room
-                for room in existing_room_data
-                if room["room_id"] == self.data["room_zone_info"][i]["room_id"]
-            )
-            if "room_name" in existing_room:
-                self.data["room_zone_info"][i]["room_name"] = existing_room["room_name"]
-            else:
-                self.data["room_zone_info"][i]["room_name"] = existing_room["room_id"]
+    def wss_update(self, data_input):
+        """Load a map payload pushed over WSS, return the parts which have changed"""
+        existing_rooms = self._rooms_by_id
+
+        changed = self._decode(data_input)
+
+        if "rooms" in changed:
+            # Map pushed over WSS doesn't carry room names, keep the known ones
+            for room in self.room_zone_info:
+                existing_room = existing_rooms.get(room["room_id"])
+                if existing_room is not None:
+                    room["room_name"] = existing_room.data.get(
+                        "room_name",
+                        existing_room.get_room_id(),
+                    )
+                elif "room_name" not in room:
+                    room["room_name"] = room["room_id"]
+            self._index_rooms()
+
+        self._update(changed)
+        return changed
 
     def get_map_bitmap(self):
         """Parse MapData into 8-Bit lightness (grayscale) bitmap, return it as bytes"""
-        self.map_bitmap = bytearray(b"")
-        for i in range(len(self.map_data)):
-            byte = self.map_data[i]
-
-            self.map_bitmap.append(((byte & 192) >> 6) * 85)
-            self.map_bitmap.append(((byte & 48) >> 4) * 85)
-            self.map_bitmap.append(((byte & 12) >> 2) * 85)
-            self.map_bitmap.append((byte & 3) * 85)
+        with self.metrics.timer("bitmap", len(self.map_data)) as timer:
+            bitmap = b"".join(map(_BITMAP_LUT.__getitem__, self.map_data))
+            timer.bytes_out = len(bitmap)
+        return bitmap
 
-        return self.map_bitmap
+    def get_base_image(self, black=(0x1C, 0x89, 0xE3), white=(0xFF, 0xFF, 0xFF)):
+        """
+        Colorized map grid at one pixel per cell, as a paletted image (one
+        byte per cell) cached per grid revision: convert it to RGBA once
+        cropped or resized
+        """
+        if self._base_image is not None and self._base_image[0] == (black, white):
+            return self._base_image[1]
+
+        size = self.map_width * self.map_height
+        with self.metrics.timer("colorize", size) as timer:
+            # Palette maps each lightness to its colorized value, white cells
+            # are transparent
+            gradient = Image.frombytes("L", (256, 1), bytes(range(256)))
+            colors = ImageOps.colorize(gradient, black, white).tobytes()
+            palette = bytearray()
+            for value in range(256):
+                palette += colors[value * 3 : value * 3 + 3]
+                palette.append(0 if value == _BITMAP_WHITE else 255)
+
+            img = Image.frombytes(
+                "P",
+                (self.map_width, self.map_height),
+                self.get_map_bitmap(),
+            )
+            img.putpalette(palette, "RGBA")
+            timer.bytes_out = size
+        self._base_image = ((black, white), img)
+        return img
 
     def get_map_image(self, black=(0x1C, 0x89, 0xE3), white=(0xFF, 0xFF, 0xFF)):
         """Get a PIL image of the current map"""
-
-        if not self.map_bitmap:
-            self.get_map_bitmap()
-
-        img = Image.frombytes(
-            "L",
-            (int(self.data["MapWidth"]), int(self.data["MapHigh"])),
-            bytes(self.map_bitmap),
+        base_image = self.get_base_image(black, white)
+        size = (
+            int((self.get_map_width()) * self.map_scale),
+            int((self.get_map_height()) * self.map_scale),
+        )
+        with self.metrics.timer(
+            "resize",
+            base_image.width * base_image.height,
+        ) as timer:
+            img = base_image.resize(size, Image.NEAREST).convert("RGBA")
+            timer.bytes_out = size[0] * size[1] * 4
+        return img
+
+    def get_room_layer(self):
+        """
+        Rooms drawn over a transparent layer the size of the map image,
+        cached per grid, origin and rooms revision
+        """
+        return self._cached(
+            "room_layer",
+            ("grid", "origin", "rooms"),
+            self._build_room_layer,
         )
-        img = ImageOps.colorize(img, black, white)
-        img = img.convert("RGBA")
-
-        img_data = img.getdata()
-
-        new_img_data = []
-
-        for pixel in img_data:
-            if pixel[0] == 255 and pixel[1] == 255 and pixel[2] == 255:
-                new_img_data.append((255, 255, 255, 0))
-            else:
-                new_img_data.append(pixel)
-
-        img.putdata(new_img_data)
-        del new_img_data
 
-        return img.resize(
-            (
-                int((self.get_map_width()) * self.map_scale),
-                int((self.get_map_height()) * self.map_scale),
-            ),
-            Image.NEAREST,
+    def _build_room_layer(self):
+        layer = Image.new(
+            "RGBA",
+            (self.map_width * self.map_scale, self.map_height * self.map_scale),
+            (0, 0, 0, 0),
         )
+        draw = VacMapDraw(self, layer)
+        for room in self.get_rooms():
+            draw.draw_room(room)
+        return layer
 
     def get_map_width(self):
-        return self.data["MapWidth"]
+        return self.map_width
 
     def get_map_height(self):
-        return self.data["MapHigh"]
+        return self.map_height
 
     def get_map_resolution(self):
-        return self.data["MapResolution"]
+        return self.map_resolution
 
     def get_room_id_by_name(self, name):
-        return next(
-            room for room in self.data["room_zone_info"] if room["room_name"] == name
-        )["room_id"]
+        room = self._rooms_by_name.get(name)
+        if room is None:
+            return None
+        return room.get_room_id()
 
     def get_room_by_id(self, room_id):
-        return VacMapRoom(
-            next(
-                room
-                for room in self.data["room_zone_info"]
-                if room["room_id"] == room_id
-            ),
-        )
+        return self._rooms_by_id.get(room_id)
 
     def get_rooms(self):
-        return [VacMapRoom(room) for room in self.data.get("room_zone_info")]
+        return list(self._rooms_by_id.values())
 
     def get_room_by_name(self, name):
-        if r_id := self.get_room_id_by_name(name):
+        if (r_id := self.get_room_id_by_name(name)) is not None:
             return self.get_room_by_id(r_id)
         return None
 
+    def get_room_at(self, point):
+        """Return the room containing the virtual point, if any"""
+        if point is None:
+            return None
+        if self._room_index is None:
+            self._room_index = VacMapRoomIndex(self.get_rooms())
+        return self._room_index.find(*point)
+
+    def get_current_room(self):
+        return self.get_room_at(self.get_robot_position_virtual())
+
     def get_charger_point_pixel(self):
         return self._scale_up_pixel_coords(
-            self._pixel_apply_offset(
-                (self.data["ChargerPoint"][0], self.data["ChargerPoint"][1]),
-            ),
+            self._pixel_apply_offset(self.charger_point),
         )
 
     def get_charger_point_virtual(self):
@@ -258,114 +1133,181 @@ class VacMap:
         return False
 
     def get_robot_position_virtual(self):
-        return self._pixel_to_virtual(self.get_robot_position_pixel())
+        """Last path point, in virtual coordinates"""
+        if not self.path_data:
+            return None
+        return self.path_data[-2], self.path_data[-1]
 
     def get_path(self):
-        if "PointData" not in self.data:
+        if self.path_data is None:
             return [], []
 
-        point_data = io.BytesIO(self.data["PointData"])
-        point_types = []
-
         coords = [self.get_charger_point_pixel()]
+        coords.extend(
+            self.virtual_to_pixel.points_rounded(
+                self.path_data[::2],
+                self.path_data[1::2],
+            ),
+        )
+        return coords, self.get_point_types(len(coords))
+
+    def get_point_type(self, index):
+        """Two bits type of path point, path starting with the charger point"""
+        byte, bit = divmod(index * 2, 8)
+        if len(self.point_types) > byte:
+            return (self.point_types[byte] << bit) & 192
+        return self.PATH_RELOCATING
+
+    def get_point_types(self, count):
+        """Types of the first count path points, decoded at once"""
+        point_types = list(
+            b"".join(map(_POINT_TYPE_LUT.__getitem__, self.point_types))[:count],
+        )
+        point_types.extend([self.PATH_RELOCATING] * (count - len(point_types)))
+        return point_types
 
-        while x := point_data.read(2):
-            coords.append(
-                self._virtual_to_pixel(
-                    (
-                        struct.unpack("h", x)[0],
-                        struct.unpack("h", point_data.read(2))[0],
-                    ),
-                ),
-            )
-
-        for i, _ in enumerate(coords):
-            byte = int(i * 2 / 8)
-            bit = int((i * 2 / 8 % 1) * 8)
-
-            if len(self.data["PointType"]) > byte:
-                value = (self.data["PointType"][byte] << bit) & 192
-            else:
-                value = self.PATH_RELOCATING
-
-            point_types.append(value)
-
-        return coords, point_types
+    def get_room_coverage(self):
+        """Cleaned area and coverage percentage of each room for current cleaning"""
+        return self.coverage.rooms
 
     def _pixel_apply_offset(self, coords):
         """Apply origin offset to (x,y) pixel coordinates"""
         x, y = coords
-        return x + self.data["MapOrigin"][0], y + self.data["MapOrigin"][1]
+        return x + self.map_origin[0], y + self.map_origin[1]
 
     def _scale_up_pixel_coords(self, coords):
         """Scale coords up by MapResolution"""
         x, y = coords
         return x * self.map_scale, y * self.map_scale
 
-    def _virtual_to_pixel_list(self, coords):
-        return [self._virtual_to_pixel(coord) for coord in coords]
-
-    def _virtual_to_pixel(self, coords):
-        """
-        Convert virtual (laser map coordinates) to pixel coords,
-        taking origin into account
-        """
-        x, y = coords
-        x, y = round(
-            (self.data["MapOrigin"][0] + (x * 2 * self.get_map_resolution()))
-            * self.map_scale,
-        ), round(
-            (self.data["MapOrigin"][1] + (y * 2 * self.get_map_resolution()))
-            * self.map_scale,
-        )
-        return x, y
-
     def _pixel_to_virtual(self, coords):
-        x, y = coords
-        x, y = x / self.map_scale, y / self.map_scale
-        x, y = (x - self.data["MapOrigin"][0]) / self.get_map_resolution() / 2, (
-            y - self.data["MapOrigin"][1]
-        ) / self.get_map_resolution() / 2
-        return x, y
+        return self.virtual_to_pixel.inverse().point(*coords)
 
     def calibration_points(self):
-        cal = list()
-
-        map_point = self._virtual_to_pixel((0, 0))
-        cal.append(
-            {
-                "vacuum": {"x": 0, "y": 0},
-                "map": {"x": int(map_point[0]), "y": int(map_point[1])},
-            },
+        """Calibration points for the map card, cached per grid and origin"""
+        return self._cached(
+            "calibration_points",
+            ("grid", "origin"),
+            self._build_calibration_points,
         )
 
-        map_point = self._virtual_to_pixel(
-            (self.get_map_width(), self.get_map_height()),
-        )
-        cal.append(
-            {
-                "vacuum": {"x": self.get_map_width(), "y": self.get_map_height()},
-                "map": {"x": int(map_point[0]), "y": int(map_point[1])},
-            },
+    def _build_calibration_points(self):
+        width, height = self.get_map_width(), self.get_map_height()
+        vacuum_points = ((0, 0), (width, height), (0, height), (width, 0))
+        map_points = self.virtual_to_pixel.points_rounded(
+            [point[0] for point in vacuum_points],
+            [point[1] for point in vacuum_points],
         )
 
-        map_point = self._virtual_to_pixel((0, self.get_map_height()))
-        cal.append(
+        return tuple(
             {
-                "vacuum": {"x": 0, "y": self.get_map_height()},
+                "vacuum": {"x": vacuum_point[0], "y": vacuum_point[1]},
                 "map": {"x": int(map_point[0]), "y": int(map_point[1])},
-            },
+            }
+            for vacuum_point, map_point in zip(vacuum_points, map_points, strict=True)
         )
 
-        map_point = self._virtual_to_pixel((self.get_map_width(), 0))
-        cal.append(
-            {
-                "vacuum": {"x": self.get_map_width(), "y": 0},
-                "map": {"x": int(map_point[0]), "y": int(map_point[1])},
-            },
+    def get_predefined_selections(self):
+        """Rooms for the map card, cached per rooms and origin"""
+        return self._cached(
+            "predefined_selections",
+            ("rooms", "origin"),
+            lambda: tuple(
+                room.get_xaiomi_vacuum_map_card_rooms() for room in self.get_rooms()
+            ),
         )
 
-        return cal
+    def get_grid_rle(self):
+        """
+        Grid cell values (0 to 3) run-length encoded in row order as a flat
+        [value, count, value, count, ...] list, cached per grid revision
+        """
+        return self._cached("grid_rle", ("grid",), self._build_grid_rle)
 
-    def get_predefined_selections(self):
-        return [room.get_xaiomi_vacuum_map_card_rooms() for room in self.get_rooms()]
+    def _build_grid_rle(self):
+        bitmap = self.get_map_bitmap()[: self.map_width * self.map_height]
+        runs = []
+        for run in re.finditer(rb"(.)\1*", bitmap, re.DOTALL):
+            runs.append(bitmap[run.start()] // 85)
+            runs.append(run.end() - run.start())
+        return runs
+
+    def get_vector_path(self, offset=0):
+        """
+        Path points from offset as a flat [x, y, x, y, ...] list of virtual
+        coordinates, with the type of each point
+        """
+        if self.path_data is None:
+            return [], []
+
+        xs = self.path_data[offset * 2 :: 2]
+        ys = self.path_data[offset * 2 + 1 :: 2]
+        # Path types start with the charger point
+        types = self.get_point_types(len(self.path_data) // 2 + 1)[offset + 1 :]
+
+        points = []
+        point_types = []
+        last = len(xs) - 1
+        for i in range(len(xs)):
+            x, y = xs[i], ys[i]
+            # Point is dropped when it is on the same place as the previous
+            # kept one, or straight on towards the next one with the same type
+            if points and i < last and types[i] == types[i + 1]:
+                dx, dy = x - points[-2], y - points[-1]
+                nx, ny = xs[i + 1] - x, ys[i + 1] - y
+                if dx * ny == dy * nx and dx * nx + dy * ny >= 0:
+                    continue
+            points.append(x)
+            points.append(y)
+            point_types.append(types[i])
+        return points, point_types
+
+    def get_vector(self, since=None, path_session=None, path_offset=0, map_id=None):
+        """
+        Vector export of the map for client side rendering. Parts unchanged
+        since the given revision are left out, path points are only sent
+        from path_offset when path_session is still the current one. State
+        of another map_id (or from the future) is ignored: all is sent
+        """
+        if map_id != self.map_id or (since is not None and since > self.revision):
+            since = path_session = None
+            path_offset = 0
+        vector = {"map_id": self.map_id, "revision": self.revision}
+
+        if since is None or self._changed_at["grid"] > since:
+            vector["grid"] = {
+                "width": self.map_width,
+                "height": self.map_height,
+                "cells": self.get_grid_rle(),
+            }
+        if since is None or self._changed_at["origin"] > since:
+            transform = self.virtual_to_cell
+            vector["origin"] = {
+                "resolution": self.map_resolution,
+                "virtual_to_cell": [
+                    transform.scale_x,
+                    transform.scale_y,
+                    transform.offset_x,
+                    transform.offset_y,
+                ],
+                "charger": list(self.get_charger_point_virtual()),
+            }
+        if since is None or self._changed_at["rooms"] > since:
+            vector["rooms"] = self.get_predefined_selections()
+
+        point_count = len(self.path_data) // 2 if self.path_data is not None else 0
+        if path_session != self.path_session or not 0 <= path_offset <= point_count:
+            path_offset = 0
+        points, point_types = self.get_vector_path(path_offset)
+        vector["path"] = {
+            "session": self.path_session,
+            "offset": path_offset,
+            "count": point_count,
+            "points": points,
+            "types": point_types,
+        }
+        return vector
+
+    def get_tile(self, zoom, x, y):
+        """PNG tile of the map, None if it is out of the map"""
+        return self.tiles.get_tile(self, zoom, x, y)
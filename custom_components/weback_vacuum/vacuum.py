@@ -12,9 +12,11 @@ from homeassistant.components.vacuum import (
     StateVacuumEntity,
     VacuumEntityFeature,
 )
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.icon import icon_for_battery_level
 
-from . import DOMAIN, VacDevice
+from . import DOMAIN, SIGNAL_NEW_DEVICE, VacDevice
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -57,14 +59,17 @@ SUB_TYPES_REPORTING_MINUTES = [
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
-    """Set up the Weback robot vacuums."""
-    vacuums = []
-    for device in hass.data[DOMAIN]:
-        vacuums.append(WebackVacuumRobot(device))
+    """Set up the Weback robot vacuums, as each robot gets ready"""
+
+    @callback
+    def async_add_vacuum(device):
+        _LOGGER.debug("Adding Weback Vacuum to Home Assistant: %s", device.name)
+        async_add_entities([WebackVacuumRobot(device)], False)
         hass.loop.create_task(device.watch_state())
 
-    _LOGGER.debug("Adding Weback Vacuums to Home Assistant: %s", vacuums)
-    async_add_entities(vacuums, False)
+    for device in hass.data[DOMAIN]:
+        async_add_vacuum(device)
+    async_dispatcher_connect(hass, SIGNAL_NEW_DEVICE, async_add_vacuum)
 
 
 class WebackVacuumRobot(StateVacuumEntity):
@@ -72,11 +77,15 @@ class WebackVacuumRobot(StateVacuumEntity):
     Weback Vacuum
     """
 
+    # Changing with each map update while cleaning, keep it out of the recorder
+    _unrecorded_attributes = frozenset({"room_coverage"})
+
     def __init__(self, device: VacDevice):
         """Initialize the Weback Vacuum."""
         self.device = device
-        self.device.subscribe(lambda vacdevice: self.schedule_update_ha_state(False))
+        self.device.subscribe(self._on_device_update)
         self._error = None
+        self._current_room_id = None
 
         self._attr_supported_features = (
             VacuumEntityFeature.TURN_ON
@@ -149,15 +158,14 @@ class WebackVacuumRobot(StateVacuumEntity):
     @property
     def fan_speed(self):
         """Return the fan speed of the vacuum cleaner."""
+        status = self.device.status
         # Check if robot is in Vacuum/Mop mode
-        if self.device.vacuum_or_mop == 1:
-            # Vacuum mode
-            _LOGGER.debug("Vacuum: (vacuum mode) fan_speed=%s", self.device.fan_status)
-            return self.device.fan_status
-        if self.device.vacuum_or_mop == 2:
-            # Mop mode
-            _LOGGER.debug("Vacuum: (mop mode) fan_speed=%s", self.device.mop_status)
-            return self.device.mop_status
+        if status.vacuum_or_mop == VacDevice.VACUUM_ON:
+            _LOGGER.debug("Vacuum: (vacuum mode) fan_speed=%s", status.fan_status)
+            return status.fan_status
+        if status.vacuum_or_mop == VacDevice.MOP_ON:
+            _LOGGER.debug("Vacuum: (mop mode) fan_speed=%s", status.mop_status)
+            return status.mop_status
         # No Mop / No Fan
         _LOGGER.debug("Vacuum: no Fan / no Mop")
         return None
@@ -169,22 +177,12 @@ class WebackVacuumRobot(StateVacuumEntity):
         water level steps of the vacuum cleaner
         """
         # Check if robot is in Vacuum/Mop mode
-        if self.device.vacuum_or_mop == 1:
-            # Vacuum mode
-            _LOGGER.debug(
-                "Vacuum: (vacuum mode) fan_speed_list=%s",
-                self.device.fan_speed_list,
-            )
+        vacuum_or_mop = self.device.status.vacuum_or_mop
+        if vacuum_or_mop == VacDevice.VACUUM_ON:
             return self.device.fan_speed_list
-        if self.device.vacuum_or_mop == 2:
-            # Mop mode
-            _LOGGER.debug(
-                "Vacuum: (mop mode) fan_speed_list=%s",
-                self.device.mop_level_list,
-            )
+        if vacuum_or_mop == VacDevice.MOP_ON:
             return self.device.mop_level_list
         # No Mop / No Fan
-        _LOGGER.debug("Vacuum: no Fan / no Mop fan_speed_list=None")
         return None
 
     @property
@@ -213,36 +211,38 @@ class WebackVacuumRobot(StateVacuumEntity):
     def extra_state_attributes(self) -> dict:
         """Return the device-specific state attributes of this vacuum."""
 
-        mode = "vacuum" if self.device.vacuum_or_mop == 1 else "mop"
+        status = self.device.status
+        mode = "vacuum" if status.vacuum_or_mop == VacDevice.VACUUM_ON else "mop"
 
         extra_value = {
             "robot_mode": mode,
-            "error_info": self.device.error_info,
+            "error_info": status.error_info,
         }
 
-        if "volume" in self.device.robot_status:
-            extra_value["volume"] = self.device.robot_status["volume"]
+        if self.device.current_room is not None:
+            extra_value["current_room"] = self.device.current_room.get_room_name()
 
-        if "voice" in self.device.robot_status:
-            extra_value["voice"] = self.device.robot_status["voice"]
+        if room_coverage := self.device.room_coverage:
+            extra_value["room_coverage"] = {
+                room["name"]: {
+                    "cleaned_area": room["cleaned_area"],
+                    "coverage": room["coverage"],
+                }
+                for room in room_coverage.values()
+            }
 
-        if "undisturb_mode" in self.device.robot_status:
-            extra_value["undisturb_mode"] = self.device.robot_status["undisturb_mode"]
+        for name in ("volume", "voice", "undisturb_mode"):
+            if (value := getattr(status, name)) is not None:
+                extra_value[name] = value
 
-        if "clean_area" in self.device.robot_status:
-            clean_area = self.device.robot_status["clean_area"]
-            if clean_area is None:
-                clean_area = 0
-            extra_value["clean_area"] = round(clean_area, 1)
+        if status.clean_area is not None:
+            extra_value["clean_area"] = round(status.clean_area, 1)
 
-        if "clean_time" in self.device.robot_status:
-            clean_time = self.device.robot_status["clean_time"]
-            if clean_time is None:
-                clean_time = 0
+        if status.clean_time is not None:
             if self.device.sub_type in SUB_TYPES_REPORTING_MINUTES:
-                extra_value["clean_time"] = (clean_time,)
+                extra_value["clean_time"] = (status.clean_time,)
             else:
-                extra_value["clean_time"] = (round(clean_time / 60, 0),)
+                extra_value["clean_time"] = (round(status.clean_time / 60, 0),)
 
         return extra_value
 
@@ -250,6 +250,24 @@ class WebackVacuumRobot(StateVacuumEntity):
     # Vacuum Entity
     # -> Method
 
+    def _on_device_update(self, device):
+        """Handle update pushed by the robot"""
+        room = device.current_room
+        room_id = room.get_room_id() if room is not None else None
+        if room_id != self._current_room_id:
+            self._current_room_id = room_id
+            if room is not None and self.hass is not None:
+                _LOGGER.debug("Vacuum: room entered=%s", room.get_room_name())
+                self.hass.bus.fire(
+                    "weback_vacuum",
+                    {
+                        "entity_id": self.entity_id,
+                        "room_entered": room.get_room_name(),
+                        "room_id": room_id,
+                    },
+                )
+        self.schedule_update_ha_state(False)
+
     def on_error(self, error):
         """Handle robot's error"""
         if error == self.device.ROBOT_ERROR_NO:
@@ -330,6 +348,6 @@ class WebackVacuumRobot(StateVacuumEntity):
         elif command == "app_zoned_clean":
             await self.device.clean_zone(params)
         elif command == "app_goto_target":
-            await self.device.goto([int(params[0] / 10), int(params[1] / 10)])
+            await self.device.goto_target(params)
         else:
             await self.device.send_command(self.name, self.sub, params)
@@ -0,0 +1,125 @@
+"""
+WSS traffic recording and replay
+
+A recording is a gzip file of JSON lines: a header, then one
+[seconds since start, "in" or "out", frame] line per frame. Secrets are
+redacted from frames before they are written.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+_LOGGER = logging.getLogger(__name__)
+
+FRAME_IN = "in"
+FRAME_OUT = "out"
+
+RECORD_VERSION = 1
+REDACTED = "**REDACTED**"
+SECRET_KEYS = frozenset(
+    {
+        "Authorization",
+        "account",
+        "jwt_token",
+        "password",
+        "pwd",
+        "token",
+        "user_account",
+    },
+)
+
+# Recordings are flushed to disk at most this often (seconds)
+FLUSH_INTERVAL = 5
+
+
+def redact(frame):
+    """Copy of frame without its secrets"""
+    if isinstance(frame, dict):
+        return {
+            key: REDACTED if key in SECRET_KEYS else redact(value)
+            for key, value in frame.items()
+        }
+    if isinstance(frame, list):
+        return [redact(value) for value in frame]
+    return frame
+
+
+class WssRecorder:
+    """Write WSS frames to a recording file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_flush = self._start
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = gzip.open(path, "wt", encoding="utf-8")  # noqa: SIM115
+        self._write({"version": RECORD_VERSION, "started": time.time()})
+        _LOGGER.debug("WssRecorder: recording WSS frames to %s", path)
+
+    def record(self, direction, frame):
+        """Add a frame received (FRAME_IN) or sent (FRAME_OUT)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._file is None:
+                return
+            self._write([round(now - self._start, 3), direction, redact(frame)])
+            if now - self._last_flush >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, line):
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+
+def read_recording(path):
+    """Header of a recording, and an iterator on its (time, direction, frame)"""
+    recording = gzip.open(path, "rt", encoding="utf-8")  # noqa: SIM115
+    header = json.loads(recording.readline())
+    if header.get("version") != RECORD_VERSION:
+        recording.close()
+        msg = f"Unsupported WSS recording version: {header}"
+        raise ValueError(msg)
+
+    def frames():
+        with recording:
+            try:
+                for line in recording:
+                    yield json.loads(line)
+            except (EOFError, zlib.error, json.JSONDecodeError):
+                # Recording was not closed, keep what was flushed
+                _LOGGER.debug("WssRecorder: %s is truncated", path)
+
+    return header, frames()
+
+
+def replay_wss(path, ctrl, speed=1.0):
+    """
+    Feed received frames of a recording to ctrl.on_message (blocking)
+    speed is a time factor, 0 replays as fast as possible
+    Return the number of frames replayed
+    """
+    _, frames = read_recording(path)
+    start = time.monotonic()
+    count = 0
+    for offset, direction, frame in frames:
+        if direction != FRAME_IN:
+            continue
+        if speed:
+            delay = offset / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        ctrl.on_message(None, json.dumps(frame))
+        count += 1
+    return count
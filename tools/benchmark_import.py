@@ -0,0 +1,60 @@
+"""
+Import time of the integration modules, each one in a fresh interpreter
+
+    python -m tools.benchmark_import [--runs N] [module ...]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+MODULES = ("webackapi", "maptransform", "vacdevice", "vacmap")
+
+# Run in the child interpreter: import one module, report time and PIL use
+IMPORT_SCRIPT = """
+import json, sys, time
+from tools.component import import_component
+start = time.perf_counter()
+import_component(sys.argv[1])
+elapsed = time.perf_counter() - start
+json.dump({"seconds": elapsed, "pil": "PIL.Image" in sys.modules}, sys.stdout)
+"""
+
+
+def measure_import(module):
+    """Import module in a new interpreter, return its import time and PIL use"""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", IMPORT_SCRIPT, module],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.stdout.write(f"{'module':<14}{'median_ms':>12}{'max_ms':>12}{'PIL':>6}\n")
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.runs)]
+        seconds = [run["seconds"] for run in runs]
+        sys.stdout.write(
+            f"{module:<14}"
+            f"{statistics.median(seconds) * 1000:>12.1f}"
+            f"{max(seconds) * 1000:>12.1f}"
+            f"{'yes' if runs[0]['pil'] else 'no':>6}\n",
+        )
+
+
+if __name__ == "__main__":
+    main()
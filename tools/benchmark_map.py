@@ -0,0 +1,159 @@
+"""
+Map pipeline benchmarks, on synthetic maps
+
+    python -m tools.benchmark_map [small|typical|large ...]
+
+tracemalloc doesn't see Pillow image buffers: maps loaded then rendered are
+also measured by the size of the images they keep, and by RSS growth.
+"""
+
+import argparse
+import base64
+import gc
+import io
+import json
+import os
+import sys
+import tracemalloc
+import zlib
+
+from . import synthmap
+from .component import import_component
+
+vacmap = import_component("vacmap")
+
+# Rendered maps kept at once to measure RSS growth
+RSS_MAPS = 4
+
+
+def measure_memory(func):
+    """Run func, return its result, memory still allocated after it and peak"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, retained, peak
+
+
+def measure_rss(func, count=RSS_MAPS):
+    """RSS growth per result of func, count results being kept (bytes)"""
+    if not os.path.exists("/proc/self/statm"):
+        return None
+
+    def rss():
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    # A first run, for imports and allocator pools not to be counted
+    func()
+    gc.collect()
+    start = rss()
+    results = [func() for _ in range(count)]
+    gc.collect()
+    growth = (rss() - start) // count
+    del results
+    return growth
+
+
+def image_bytes(img):
+    return img.width * img.height * len(img.getbands()) if img is not None else 0
+
+
+def pillow_bytes(vac_map):
+    """Memory of the Pillow images a map keeps (not seen by tracemalloc)"""
+    images = [
+        vac_map._base_image[1] if vac_map._base_image else None,  # noqa: SLF001
+        vac_map.coverage.mask,
+    ]
+    room_masks = vac_map.coverage._room_masks  # noqa: SLF001
+    images.extend(mask for _, _, mask, _ in room_masks)
+    images.extend(
+        value
+        for _, value in vac_map._cache.values()  # noqa: SLF001
+        if hasattr(value, "getbands")
+    )
+    return sum(map(image_bytes, images))
+
+
+def load_and_render(payload):
+    """Load a map and render it as VacDevice does, return the map"""
+    vac_map = vacmap.VacMap(payload)
+    vac_map_draw = vacmap.VacMapDraw(vac_map)
+    vac_map_draw.draw_charger_point()
+    vac_map_draw.draw_path()
+    vac_map_draw.draw_robot_position()
+    img = vac_map_draw.get_image()
+    img.save(io.BytesIO(), format="PNG")
+    img.close()
+    return vac_map
+
+
+def legacy_load(payload):
+    """What VacMap used to keep: decoded payload, grid copy and expanded bitmap"""
+    data = json.loads(zlib.decompress(base64.b64decode(payload)))
+    map_data = bytearray(base64.b64decode(data["MapData"]))
+    map_bitmap = bytearray()
+    for byte in map_data:
+        map_bitmap.extend(((byte >> shift) & 3) * 85 for shift in (6, 4, 2, 0))
+    data["PointData"] = base64.b64decode(data["PointData"])
+    data["PointType"] = base64.b64decode(data["PointType"])
+    return data, map_data, map_bitmap
+
+
+def legacy_decode(payload):
+    """Previous one shot payload decoding"""
+    return json.loads(zlib.decompress(base64.b64decode(payload)))
+
+
+def bench_memory(name):
+    payload = synthmap.preset(name).payload()
+    _, retained, peak = measure_memory(lambda: vacmap.VacMap(payload))
+    _, legacy_retained, _ = measure_memory(lambda: legacy_load(payload))
+    _, _, decode_peak = measure_memory(
+        lambda: vacmap.decode_map_payload(payload, vacmap.VacMap.MAX_PAYLOAD_SIZE),
+    )
+    _, _, legacy_decode_peak = measure_memory(lambda: legacy_decode(payload))
+    rendered, rendered_retained, _ = measure_memory(lambda: load_and_render(payload))
+    return {
+        "payload": len(payload),
+        "retained": retained,
+        "peak": peak,
+        "legacy_retained": legacy_retained,
+        "decode_peak": decode_peak,
+        "legacy_decode_peak": legacy_decode_peak,
+        "rendered_retained": rendered_retained,
+        "rendered_pillow": pillow_bytes(rendered),
+        "rendered_rss": measure_rss(lambda: load_and_render(payload)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("presets", nargs="*", default=list(synthmap.PRESETS))
+    args = parser.parse_args(argv)
+
+    columns = (
+        "payload",
+        "retained",
+        "peak",
+        "legacy_retained",
+        "decode_peak",
+        "legacy_decode_peak",
+        "rendered_retained",
+        "rendered_pillow",
+        "rendered_rss",
+    )
+    sys.stdout.write(f"{'map':<10}" + "".join(f"{c:>20}" for c in columns) + "\n")
+    for name in args.presets:
+        result = bench_memory(name)
+        sys.stdout.write(
+            f"{name:<10}" + "".join(f"{result[c]:>20}" for c in columns) + "\n",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Map pipeline benchmarks per stage (decode, bitmap, image, path, drawing,
+PNG encode), time and peak memory on synthetic maps
+
+    python -m tools.benchmark_pipeline [small|typical|large ...] [--runs N]
+        [--baseline [FILE]] [--threshold 0.25] [--save-baseline [FILE]]
+
+FILE defaults to tools/benchmark_baseline.json. Compared to a baseline,
+a stage whose best time or peak memory goes over the baseline plus
+threshold is a regression and the command exits with 1. Timings only
+compare with a baseline recorded on the same machine.
+"""
+
+import argparse
+import gc
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from . import synthmap
+from .component import import_component
+
+vacmap = import_component("vacmap")
+
+BASELINE_FILE = Path(__file__).resolve().parent / "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+
+
+def _drawn_map(payload):
+    vac_map = vacmap.VacMap(payload)
+    return vacmap.VacMapDraw(vac_map)
+
+
+def _rendered_image(payload):
+    vac_map_draw = _drawn_map(payload)
+    vac_map_draw.draw_charger_point()
+    vac_map_draw.draw_path()
+    vac_map_draw.draw_robot_position()
+    return vac_map_draw.get_image()
+
+
+def _encode_png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# Stage name -> (setup(payload), run(setup result)), only run is measured
+STAGES = {
+    "load_data": (lambda payload: payload, vacmap.VacMap),
+    "get_map_bitmap": (vacmap.VacMap, lambda vac_map: vac_map.get_map_bitmap()),
+    "get_map_image": (vacmap.VacMap, lambda vac_map: vac_map.get_map_image()),
+    "get_path": (vacmap.VacMap, lambda vac_map: vac_map.get_path()),
+    "draw_path": (_drawn_map, lambda vac_map_draw: vac_map_draw.draw_path()),
+    "png_encode": (_rendered_image, _encode_png),
+    "render_map": (
+        lambda payload: payload,
+        lambda payload: _encode_png(_rendered_image(payload)),
+    ),
+}
+
+
+def measure_stage(stage, payload, runs):
+    """Median and best time (ms) of a stage over runs, and its peak memory (bytes)"""
+    setup, run = STAGES[stage]
+
+    times = []
+    for _ in range(runs):
+        arg = setup(payload)
+        gc.collect()
+        start = time.perf_counter()
+        run(arg)
+        times.append((time.perf_counter() - start) * 1000)
+
+    arg = setup(payload)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "best_ms": round(min(times), 3),
+        "peak_bytes": peak,
+    }
+
+
+def run_benchmarks(presets, runs):
+    results = {}
+    for name in presets:
+        payload = synthmap.preset(name).payload()
+        results[name] = {stage: measure_stage(stage, payload, runs) for stage in STAGES}
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """(preset, stage, metric, baseline, result) over baseline plus threshold"""
+    # Best time is the least sensitive to other processes running
+    return [
+        (name, stage, metric, reference[metric], result[metric])
+        for name, stages in results.items()
+        for stage, result in stages.items()
+        if (reference := baseline.get(name, {}).get(stage)) is not None
+        for metric in ("best_ms", "peak_bytes")
+        if result[metric] > reference[metric] * (1 + threshold)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("presets", nargs="*", default=list(synthmap.PRESETS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, nargs="?", const=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument(
+        "--save-baseline",
+        type=Path,
+        nargs="?",
+        const=BASELINE_FILE,
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.presets, args.runs)
+
+    sys.stdout.write(
+        f"{'map':<10}{'stage':<16}{'median_ms':>12}{'best_ms':>12}{'peak_kb':>12}\n",
+    )
+    for name, stages in results.items():
+        for stage, result in stages.items():
+            sys.stdout.write(
+                f"{name:<10}{stage:<16}"
+                f"{result['median_ms']:>12.2f}{result['best_ms']:>12.2f}"
+                f"{result['peak_bytes'] / 1024:>12.1f}\n",
+            )
+
+    if args.save_baseline is not None:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = find_regressions(results, baseline, args.threshold)
+        for name, stage, metric, reference, result in regressions:
+            sys.stdout.write(
+                f"REGRESSION {name} {stage} {metric}: {reference} -> {result}\n",
+            )
+        if regressions:
+            sys.exit(1)
+        sys.stdout.write(f"No regression over {args.threshold:.0%} of baseline\n")
+
+
+if __name__ == "__main__":
+    main()
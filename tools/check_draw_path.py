@@ -0,0 +1,122 @@
+"""
+Check VacMapDraw.draw_path against the previous per-segment drawing
+
+    python -m tools.check_draw_path [small|typical|large ...]
+
+Paths are drawn on synthetic maps, and on paths made of repeated points and
+relocations, with relocating segments hidden and drawn. Images must be
+byte-identical, exits 1 otherwise.
+"""
+
+import argparse
+import base64
+import sys
+
+from . import synthmap
+from .component import import_component
+
+vacmap = import_component("vacmap")
+VacMap = vacmap.VacMap
+
+DEFAULT_PRESETS = ("small", "typical")
+VACUUMING = VacMap.PATH_VACUUMING
+RELOCATING = VacMap.PATH_RELOCATING
+
+
+def legacy_draw_path(vac_map_draw, col, invisible_relocate):
+    """draw_path as it was: an ImageDraw.line call per segment"""
+    path, point_types = vac_map_draw.vac_map.get_path()
+
+    last_coord = None
+
+    for i, coord in enumerate(path):
+        if not last_coord:
+            last_coord = coord
+            continue
+
+        point_type = point_types[i]
+        if point_type == VacMap.PATH_VACUUMING or invisible_relocate is False:
+            vac_map_draw.draw.line(
+                (last_coord, coord),
+                col if point_type == VacMap.PATH_VACUUMING else (255, 255, 255, 0),
+                width=3,
+            )
+
+        last_coord = coord
+
+
+def repeated_points(synth):
+    """Each point three times, then one virtual unit away (same pixel)"""
+    path = []
+    for x, y, point_type in synth.path[:500]:
+        path.extend([(x, y, point_type)] * 3)
+        path.append((x + 1, y, VACUUMING))
+    return path
+
+
+def relocations(synth):
+    """Relocating first and last, alone, in runs, and every other point"""
+    path = synth.path[:600]
+    types = [RELOCATING] * 3 + [VACUUMING] * 50 + [RELOCATING]
+    types += [VACUUMING, RELOCATING] * 100 + [RELOCATING] * 40
+    types += [VACUUMING] * (len(path) - len(types) - 1) + [RELOCATING]
+    return [
+        (x, y, point_type) for (x, y, _), point_type in zip(path, types, strict=True)
+    ]
+
+
+def cases(presets):
+    """(name, payload) of the maps to draw paths on"""
+    for name in presets:
+        yield name, synthmap.preset(name).payload()
+
+    synth = synthmap.preset("small")
+    for name, make_path in (
+        ("repeated points", repeated_points),
+        ("relocations", relocations),
+    ):
+        synth.path = make_path(synth)
+        yield name, synth.payload()
+
+    synth.path = [synth.path[0]]
+    yield "single point", synth.payload()
+
+    # Points past the point types are relocating
+    synth.path = repeated_points(synthmap.preset("small"))
+    data = synth.payload_dict()
+    point_types = base64.b64decode(data["PointType"])
+    data["PointType"] = base64.b64encode(point_types[: len(point_types) // 2]).decode()
+    yield "missing point types", synthmap.encode_payload(data)
+
+
+def check(payload, invisible_relocate):
+    """Tell if both drawings of the path of payload are identical"""
+    col = (0x1C, 0xE3, 0xDA, 0xFF)
+    vac_map = VacMap(payload)
+    expected = vacmap.VacMapDraw(vac_map)
+    legacy_draw_path(expected, col, invisible_relocate)
+    drawn = vacmap.VacMapDraw(vac_map)
+    drawn.draw_path(col, invisible_relocate)
+    return drawn.get_image().tobytes() == expected.get_image().tobytes()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("presets", nargs="*", default=DEFAULT_PRESETS)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for name, payload in cases(args.presets):
+        for invisible_relocate in (True, False):
+            same = check(payload, invisible_relocate)
+            failures += not same
+            sys.stdout.write(
+                f"{name:<22}invisible_relocate={invisible_relocate!s:<6}"
+                f"{'ok' if same else 'DIFFERENT'}\n",
+            )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
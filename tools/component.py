@@ -0,0 +1,21 @@
+"""
+Import the integration modules without Home Assistant: the package is
+registered without running its __init__ (which needs homeassistant)
+"""
+
+import importlib
+import sys
+import types
+from pathlib import Path
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components"
+PACKAGE = "weback_vacuum"
+
+
+def import_component(name):
+    """Import a module of the integration, e.g. import_component("vacmap")"""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(COMPONENT_DIR / PACKAGE)]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{name}")
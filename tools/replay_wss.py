@@ -0,0 +1,90 @@
+"""
+Replay a WSS recording through a VacDevice, to benchmark the status and map
+pipeline on real cleanings without a robot
+
+    python -m tools.replay_wss FILE [--speed 0]
+
+Recordings are made with the record_wss option. Speed 1 replays in real
+time, 0 (default) as fast as possible. Time spent handling each received
+frame is reported per frame kind, then each map pipeline stage.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from .component import import_component
+
+vacdevice = import_component("vacdevice")
+wssrecord = import_component("wssrecord")
+
+# Credentials and app details, never used: nothing is asked to the cloud
+ACCOUNT = ("replay", "replay", "0", "en", "WeBack", "yugong_app", "1.0")
+
+
+class ReplayDevice(vacdevice.VacDevice):
+    """VacDevice fed by a recording only, maps come from its map_data frames"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {}
+
+    async def load_maps(self):
+        return False
+
+    def on_message(self, ws, message):
+        start = time.perf_counter()
+        super().on_message(ws, message)
+        elapsed = time.perf_counter() - start
+        kind = json.loads(message).get("notify_info")
+        self.timings.setdefault(kind, []).append(elapsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    device = ReplayDevice("replay", "Replay", "replay", {}, *ACCOUNT, metrics=True)
+    start = time.perf_counter()
+    frames = wssrecord.replay_wss(args.recording, device, args.speed)
+    elapsed = time.perf_counter() - start
+
+    sys.stdout.write(f"{frames} frames replayed in {elapsed:.2f}s\n")
+    sys.stdout.write(
+        f"{'frame':<22}{'count':>8}{'mean_ms':>10}{'p95_ms':>10}{'max_ms':>10}\n",
+    )
+    for kind, frame_timings in device.timings.items():
+        timings = sorted(frame_timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        sys.stdout.write(
+            f"{kind:<22}{len(timings):>8}"
+            f"{statistics.mean(timings) * 1000:>10.2f}"
+            f"{p95 * 1000:>10.2f}{timings[-1] * 1000:>10.2f}\n",
+        )
+
+    sys.stdout.write(
+        f"{'stage':<22}{'count':>8}{'p50_ms':>10}{'p95_ms':>10}{'max_ms':>10}"
+        f"{'kb_in':>10}{'kb_out':>10}\n",
+    )
+    for stage, summary in device.metrics.summary().items():
+        sys.stdout.write(
+            f"{stage:<22}{summary['count']:>8}{summary['p50_ms']:>10.2f}"
+            f"{summary['p95_ms']:>10.2f}{summary['max_ms']:>10.2f}"
+            f"{summary['bytes_in'] / 1024:>10.1f}"
+            f"{summary['bytes_out'] / 1024:>10.1f}\n",
+        )
+
+    sys.stdout.write(f"Final status: {device.robot_status}\n")
+    if device.map is not None and device.map.path_data is not None:
+        sys.stdout.write(
+            f"Map revision {device.map_revision}, "
+            f"{len(device.map.path_data) // 2} path points\n",
+        )
+
+
+if __name__ == "__main__":
+    main()
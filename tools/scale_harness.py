@@ -0,0 +1,215 @@
+"""
+Scale test: N robots cleaning and pushing map_data frames at once, against
+the local WeBack cloud emulator
+
+    python -m tools.scale_harness [N ...] [--window 20] [--preset small]
+        [--tick 0.5] [--points-per-tick 20]
+
+For each N (1, 5, 20 and 50 by default), reports event loop lag, CPU used
+per robot, thread count, memory growth and the latency from a status frame
+sent by the emulator to the entity update callback on the event loop. The
+emulator runs in its own process, not to be counted in CPU and memory.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .component import import_component
+from .weback_emulator import DEFAULT_PASSWORD, DEFAULT_USER
+
+vacdevice = import_component("vacdevice")
+webackapi = import_component("webackapi")
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_ROBOTS = (1, 5, 20, 50)
+LAG_PROBE_INTERVAL = 0.05
+EMULATOR_START_TIMEOUT = 10
+WARMUP = 2
+
+# Credentials and app details for WebackApi and VacDevice
+ACCOUNT = (DEFAULT_USER, DEFAULT_PASSWORD, "33", "en", "WeBack", "yugong_app", "1.0")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss():
+    """Resident memory of this process (bytes)"""
+    with contextlib.suppress(OSError), open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    # Peak only, where /proc isn't available
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentiles(values):
+    """p50, p95 and max of values, in ms"""
+    if not values:
+        return (float("nan"),) * 3
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return (statistics.median(values) * 1000, p95 * 1000, values[-1] * 1000)
+
+
+async def start_emulator(robots, args):
+    """Run the emulator in a subprocess, return it and its auth URL once up"""
+    port = _free_port()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "tools.weback_emulator",
+        "--robots",
+        str(robots),
+        "--preset",
+        args.preset,
+        "--port",
+        str(port),
+        "--tick",
+        str(args.tick),
+        "--points-per-tick",
+        str(args.points_per_tick),
+        "--stamp-status",
+        cwd=ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + EMULATOR_START_TIMEOUT
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            if time.monotonic() > deadline:
+                process.kill()
+                raise
+            await asyncio.sleep(0.1)
+            continue
+        writer.close()
+        return process, f"http://127.0.0.1:{port}/prod/oauth"
+
+
+async def probe_loop_lag(lags):
+    """Record how late the event loop wakes up a sleeping task"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        lags.append(max(loop.time() - start - LAG_PROBE_INTERVAL, 0))
+
+
+async def run_scale(robots, args):
+    """Clean with robots robots at once and measure over args.window"""
+    loop = asyncio.get_running_loop()
+    process, auth_url = await start_emulator(robots, args)
+    devices, tasks = [], []
+    latencies = []
+    # Last stamp seen per robot: map_data frames call subscribers too, with
+    # the status (and stamp) of the previous status frame
+    last_sent = {}
+
+    def status_received(device):
+        sent = device.robot_status.get("emulator_sent")
+        if sent is not None and last_sent.get(device.name) != sent:
+            last_sent[device.name] = sent
+            # Entities update from the event loop, as schedule_update_ha_state
+            loop.call_soon_threadsafe(lambda: latencies.append(time.time() - sent))
+
+    try:
+        rss_start = _rss()
+        api = webackapi.WebackApi(*ACCOUNT, auth_url=auth_url)
+        await api.login()
+        for robot in await api.get_robot_list():
+            device = vacdevice.VacDevice(
+                robot["thing_name"],
+                robot["thing_nickname"],
+                robot["sub_type"],
+                robot["thing_status"],
+                *ACCOUNT,
+                auth_url=auth_url,
+            )
+            device.subscribe(status_received)
+            devices.append(device)
+
+        await asyncio.gather(*(device.load_maps() for device in devices))
+        await asyncio.gather(*(device.connect_wss() for device in devices))
+        tasks.extend(asyncio.create_task(device.watch_state()) for device in devices)
+        await asyncio.gather(*(device.turn_on() for device in devices))
+        await asyncio.sleep(WARMUP)
+
+        lags = []
+        latencies.clear()
+        lag_task = asyncio.create_task(probe_loop_lag(lags))
+        tasks.append(lag_task)
+        rss_window = _rss()
+        cpu_start = time.process_time()
+        await asyncio.sleep(args.window)
+        cpu = time.process_time() - cpu_start
+
+        return {
+            "robots": robots,
+            "lag": _percentiles(lags),
+            "cpu_per_robot": cpu / args.window / robots * 100,
+            "threads": threading.active_count(),
+            "rss_setup": rss_window - rss_start,
+            "rss_growth": _rss() - rss_window,
+            "latency": _percentiles(latencies),
+            "updates": len(latencies),
+        }
+    finally:
+        for task in tasks:
+            task.cancel()
+        for device in devices:
+            if device.ws is not None:
+                device.ws.close()
+        # Let WSS threads end before the event loop closes
+        for device in devices:
+            if device.wst is not None:
+                await loop.run_in_executor(None, device.wst.join, 5)
+        process.terminate()
+        await process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("robots", nargs="*", type=int, default=DEFAULT_ROBOTS)
+    parser.add_argument("--window", type=float, default=20)
+    parser.add_argument("--preset", default="small")
+    parser.add_argument("--tick", type=float, default=0.5)
+    parser.add_argument("--points-per-tick", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.stdout.write(
+        f"{'robots':>6}{'lag_p50':>9}{'lag_p95':>9}{'lag_max':>9}"
+        f"{'cpu%/rob':>10}{'threads':>9}{'setup_mb':>10}{'grow_mb':>9}"
+        f"{'lat_p50':>9}{'lat_p95':>9}{'lat_max':>9}{'updates':>9}\n",
+    )
+    for robots in args.robots:
+        result = asyncio.run(run_scale(robots, args))
+        sys.stdout.write(
+            f"{robots:>6}"
+            + "".join(f"{value:>9.1f}" for value in result["lag"])
+            + f"{result['cpu_per_robot']:>10.2f}{result['threads']:>9}"
+            f"{result['rss_setup'] / 2**20:>10.1f}"
+            f"{result['rss_growth'] / 2**20:>9.1f}"
+            + "".join(f"{value:>9.1f}" for value in result["latency"])
+            + f"{result['updates']:>9}\n",
+        )
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
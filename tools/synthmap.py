@@ -0,0 +1,166 @@
+"""
+Synthetic WeBack laser map payloads, for benchmarks and offline tools
+"""
+
+import base64
+import json
+import random
+import struct
+import zlib
+
+# Grid size, rooms per side and path length of each preset
+PRESETS = {
+    "small": (200, 150, 2, 2_000),
+    "typical": (600, 500, 3, 20_000),
+    "large": (1500, 1200, 4, 100_000),
+}
+
+MAP_RESOLUTION = 0.05
+# Cell values as rendered by VacMap: unknown cells are transparent
+CELL_WALL = 0
+CELL_FLOOR = 2
+CELL_UNKNOWN = 3
+
+
+def _pack_cells(cells):
+    """Pack 2 bits cells into MapData bytes, 4 cells per byte"""
+    packed = bytearray((len(cells) + 3) // 4)
+    for i, cell in enumerate(cells):
+        packed[i // 4] |= cell << (6 - (i % 4) * 2)
+    return bytes(packed)
+
+
+def _pack_point_types(types):
+    """Pack 2 bits path point types, 4 points per byte"""
+    packed = bytearray((len(types) + 3) // 4)
+    for i, point_type in enumerate(types):
+        packed[i // 4] |= point_type >> ((i % 4) * 2)
+    return bytes(packed)
+
+
+class SyntheticMap:
+    """Laser map made of a grid of rectangular rooms and a zigzag cleaning path"""
+
+    def __init__(self, width, height, rooms_per_side, points, seed=0):
+        self.width = width
+        self.height = height
+        self.rooms_per_side = rooms_per_side
+        self.points = points
+        self.random = random.Random(seed)  # noqa: S311
+        self.origin = (width / 2, height / 2)
+        self.margin = 5
+        self.cells = self._make_cells()
+        self.map_data = base64.b64encode(_pack_cells(self.cells)).decode()
+        self.rooms = self._make_rooms()
+        self.path = self._make_path(points)
+
+    def to_virtual(self, x, y):
+        """Map cell coordinates to virtual coordinates"""
+        return (
+            round((x - self.origin[0]) / (2 * MAP_RESOLUTION)),
+            round((y - self.origin[1]) / (2 * MAP_RESOLUTION)),
+        )
+
+    def _room_boxes(self):
+        inner_w = self.width - 2 * self.margin
+        inner_h = self.height - 2 * self.margin
+        for row in range(self.rooms_per_side):
+            for col in range(self.rooms_per_side):
+                yield (
+                    self.margin + col * inner_w // self.rooms_per_side,
+                    self.margin + row * inner_h // self.rooms_per_side,
+                    self.margin + (col + 1) * inner_w // self.rooms_per_side - 1,
+                    self.margin + (row + 1) * inner_h // self.rooms_per_side - 1,
+                )
+
+    def _make_cells(self):
+        cells = bytearray([CELL_UNKNOWN]) * (self.width * self.height)
+        for x0, y0, x1, y1 in self._room_boxes():
+            for y in range(y0, y1 + 1):
+                row = y * self.width
+                cells[row + x0 : row + x1 + 1] = bytes([CELL_FLOOR]) * (x1 - x0 + 1)
+                cells[row + x0] = cells[row + x1] = CELL_WALL
+            row_top, row_bottom = y0 * self.width, y1 * self.width
+            cells[row_top + x0 : row_top + x1 + 1] = bytes([CELL_WALL]) * (x1 - x0 + 1)
+            cells[row_bottom + x0 : row_bottom + x1 + 1] = bytes([CELL_WALL]) * (
+                x1 - x0 + 1
+            )
+        return cells
+
+    def _make_rooms(self):
+        rooms = []
+        for room_id, (x0, y0, x1, y1) in enumerate(self._room_boxes(), 1):
+            corners = [
+                self.to_virtual(x0, y0),
+                self.to_virtual(x1, y0),
+                self.to_virtual(x1, y1),
+                self.to_virtual(x0, y1),
+            ]
+            rooms.append(
+                {
+                    "room_id": room_id,
+                    "room_name": f"Room {room_id}",
+                    "clean_times": 1,
+                    "clean_order": room_id,
+                    "room_point_x": [corner[0] for corner in corners],
+                    "room_point_y": [corner[1] for corner in corners],
+                },
+            )
+        return rooms
+
+    def _make_path(self, points):
+        """Zigzag lanes over the rooms, with a few relocating jumps"""
+        path = []
+        lane = 0
+        boxes = list(self._room_boxes())
+        while len(path) < points:
+            x0, y0, x1, y1 = boxes[lane % len(boxes)]
+            y = y0 + 2 + (lane // len(boxes) * 4) % max(y1 - y0 - 4, 1)
+            xs = (x0 + 2, x1 - 2) if lane % 2 == 0 else (x1 - 2, x0 + 2)
+            steps = max(abs(xs[1] - xs[0]) * 2, 1)
+            for step in range(steps + 1):
+                x = xs[0] + (xs[1] - xs[0]) * step / steps
+                jitter = self.random.uniform(-0.3, 0.3)
+                point_type = 0x40 if step == 0 else 0x0
+                path.append((*self.to_virtual(x + jitter, y + jitter), point_type))
+                if len(path) >= points:
+                    break
+            lane += 1
+        return path
+
+    def payload_dict(self, points=None):
+        """Decoded map payload, path truncated to the first points"""
+        path = self.path[:points] if points is not None else self.path
+        return {
+            "MapWidth": self.width,
+            "MapHigh": self.height,
+            "MapResolution": MAP_RESOLUTION,
+            "MapOrigin": list(self.origin),
+            # Charger point is relative to the map origin
+            "ChargerPoint": [
+                self.margin + 2 - self.origin[0],
+                self.margin + 2 - self.origin[1],
+            ],
+            "MapData": self.map_data,
+            "room_zone_info": json.loads(json.dumps(self.rooms)),
+            "PointData": base64.b64encode(
+                b"".join(struct.pack("hh", x, y) for x, y, _ in path),
+            ).decode(),
+            # First type is the charger point heading the path
+            "PointType": base64.b64encode(
+                _pack_point_types([0x40] + [t for _, _, t in path]),
+            ).decode(),
+        }
+
+    def payload(self, points=None):
+        """Encoded map payload, as sent by reuse_map_get and map_data frames"""
+        return encode_payload(self.payload_dict(points))
+
+
+def encode_payload(data):
+    return base64.b64encode(zlib.compress(json.dumps(data).encode())).decode()
+
+
+def preset(name, seed=0):
+    width, height, rooms_per_side, points = PRESETS[name]
+    return SyntheticMap(width, height, rooms_per_side, points, seed)
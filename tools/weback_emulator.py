@@ -0,0 +1,432 @@
+"""
+Local WeBack cloud emulator: OAuth and API over HTTP, robots over WSS
+
+    python -m tools.weback_emulator [--robots N] [--preset small] [--port 8765]
+        [--latency 0.05] [--jitter 0.02] [--drop-rate 0.01]
+        [--disconnect-every 100] [--stamp-status]
+
+Point the integration at it with WebackApi(..., auth_url=emulator.auth_url).
+Robots clean their synthetic map when asked to, pushing thing_status_update
+and map_data frames like the real cloud does. Latency, dropped frames and
+disconnections can be injected to test the integration offline. With
+stamp_status, status frames carry the time they were sent at
+(emulator_sent, epoch seconds) to measure end to end latency.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import hashlib
+import json
+import logging
+import random
+import secrets
+import sys
+import time
+
+from aiohttp import WSMsgType, web
+
+from . import synthmap
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_USER = "emulator@weback.local"
+DEFAULT_PASSWORD = "emulator"  # noqa: S105
+
+TOKEN_DURATION = 3600
+
+CLEANING_MODES = {
+    "AutoClean",
+    "EdgeClean",
+    "SpotClean",
+    "RoomClean",
+    "SelectClean",
+    "MopClean",
+    "SmartClean",
+    "ZmodeClean",
+    "PlanningLocation",
+    "PlanningRect",
+}
+RETURNING = "BackCharging"
+CHARGE_DONE = "ChargeDone"
+
+
+class EmulatedRobot:
+    """Robot state, and its cleaning progress over a synthetic map"""
+
+    def __init__(self, index, vac_map, points_per_tick):
+        self.thing_name = f"emulator-robot-{index}"
+        self.nickname = f"Emulated robot {index}"
+        self.sub_type = "emulator-laser"
+        self.map_id = 1000 + index
+        self.map = vac_map
+        self.points_per_tick = points_per_tick
+        self.path_points = vac_map.points
+        self.task = None
+        self.status = {
+            "working_status": CHARGE_DONE,
+            "connected": "true",
+            "battery_level": 100,
+            "fan_status": "Normal",
+            "water_level": "None",
+            "error_info": "NoError",
+            "clean_time": 0,
+            "clean_area": 0,
+            "volume": 50,
+            "voice": "on",
+            "undisturb_mode": "off",
+            "hismap_id": self.map_id,
+        }
+
+    @property
+    def is_cleaning(self):
+        return self.status["working_status"] in CLEANING_MODES
+
+    def thing_info(self):
+        return {
+            "thing_name": self.thing_name,
+            "thing_nickname": self.nickname,
+            "sub_type": self.sub_type,
+            "thing_status": copy.deepcopy(self.status),
+        }
+
+    def map_payload(self, room_names=True):
+        """Map with the path cleaned so far, pushed maps have no room names"""
+        data = self.map.payload_dict(self.path_points)
+        if not room_names:
+            for room in data["room_zone_info"]:
+                del room["room_name"]
+        return synthmap.encode_payload(data)
+
+    def apply(self, state):
+        """Apply the state sent by a send_to_device command"""
+        working_status = state.get("working_status")
+        if (
+            working_status in CLEANING_MODES
+            and not self.is_cleaning
+            and self.status["working_status"] != "Standby"
+        ):
+            # New cleaning (not resumed): path restarts
+            self.path_points = 1
+            self.status["clean_time"] = 0
+            self.status["clean_area"] = 0
+        self.status.update(state)
+
+    def tick(self, tick):
+        """Move the robot forward during tick seconds, return if it moved"""
+        working_status = self.status["working_status"]
+        if working_status == RETURNING:
+            self.status["working_status"] = CHARGE_DONE
+            return True
+        if not self.is_cleaning:
+            return False
+
+        self.path_points = min(self.path_points + self.points_per_tick, self.map.points)
+        self.status["clean_time"] += round(tick)
+        self.status["clean_area"] = round(
+            self.path_points * synthmap.MAP_RESOLUTION * 0.2,
+            1,
+        )
+        self.status["battery_level"] = max(self.status["battery_level"] - 1, 5)
+        if self.path_points >= self.map.points:
+            self.status["working_status"] = RETURNING
+        return True
+
+
+class WebackEmulator:
+    """
+    Emulated grit-cloud endpoints. Fault injection attributes (latency,
+    jitter, drop_rate, disconnect_every) can be changed while running
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        robots=1,
+        *,
+        preset="small",
+        host="127.0.0.1",
+        port=0,
+        tick=1.0,
+        points_per_tick=200,
+        latency=0.0,
+        jitter=0.0,
+        drop_rate=0.0,
+        disconnect_every=None,
+        user=DEFAULT_USER,
+        password=DEFAULT_PASSWORD,
+        seed=0,
+        stamp_status=False,
+    ):
+        self.host = host
+        self.port = port
+        self.tick = tick
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.disconnect_every = disconnect_every
+        self.stamp_status = stamp_status
+        self.user = user
+        self.password_hash = hashlib.md5(password.encode()).hexdigest()  # noqa: S324
+        self.random = random.Random(seed)  # noqa: S311
+        self.tokens = set()
+        self.robots = {}
+        for index in range(robots):
+            robot = EmulatedRobot(
+                index,
+                synthmap.preset(preset, seed + index),
+                points_per_tick,
+            )
+            self.robots[robot.thing_name] = robot
+        # Socket -> names of the robots it asked about
+        self.sockets = {}
+        self.stats = dict.fromkeys(
+            ("http", "received", "sent", "dropped", "disconnects"),
+            0,
+        )
+        self._runner = None
+        self._tasks = set()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def auth_url(self):
+        return f"{self.base_url}/prod/oauth"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/prod/oauth", self.handle_oauth)
+        app.router.add_post("/api", self.handle_api)
+        app.router.add_get("/wss", self.handle_wss)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 asks for any free port
+        self.port = site._server.sockets[0].getsockname()[1]  # noqa: SLF001
+        _LOGGER.info("WeBack emulator listening, auth URL: %s", self.auth_url)
+
+    async def stop(self):
+        for robot in self.robots.values():
+            if robot.task is not None:
+                robot.task.cancel()
+        await self.disconnect_all()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def disconnect_all(self):
+        """Close every WSS connection, as the cloud sometimes does"""
+        for socket in list(self.sockets):
+            await self._disconnect(socket)
+
+    async def _disconnect(self, socket):
+        self.sockets.pop(socket, None)
+        self.stats["disconnects"] += 1
+        await socket.close()
+
+    # HTTP
+
+    async def handle_oauth(self, request):
+        self.stats["http"] += 1
+        body = await request.json()
+        payload, header = body.get("payload", {}), body.get("header", {})
+        await self._delay()
+
+        if payload.get("opt") != "login":
+            return web.json_response({"msg": "ServiceErrorException"})
+        if header.get("account") != self.user:
+            return web.json_response({"msg": "UserNotExist"})
+        if payload.get("pwd") != self.password_hash:
+            return web.json_response({"msg": "PasswordInvalid"})
+
+        token = secrets.token_hex(16)
+        self.tokens.add(token)
+        ws_url = self.base_url.replace("http://", "ws://")
+        return web.json_response(
+            {
+                "msg": "success",
+                "data": {
+                    "jwt_token": token,
+                    "region_name": "emulator",
+                    "wss_url": f"{ws_url}/wss",
+                    "api_url": f"{self.base_url}/api",
+                    "expired_time": TOKEN_DURATION,
+                },
+            },
+        )
+
+    async def handle_api(self, request):
+        self.stats["http"] += 1
+        body = await request.json()
+        await self._delay()
+
+        if request.headers.get("Token") not in self.tokens:
+            return web.json_response({"msg": "TokenInvalid"})
+
+        opt = body.get("opt")
+        if opt == "user_thing_list_get":
+            return web.json_response(
+                {
+                    "msg": "success",
+                    "data": {
+                        "thing_list": [
+                            robot.thing_info() for robot in self.robots.values()
+                        ],
+                    },
+                },
+            )
+        if opt == "reuse_map_get":
+            robot = self.robots.get(body.get("thing_name"))
+            if robot is None or body.get("map_id") != str(robot.map_id):
+                return web.json_response({"msg": "MapNotExist"})
+            return web.json_response(
+                {"msg": "success", "data": {"map_data": robot.map_payload()}},
+            )
+        return web.json_response({"msg": "ServiceErrorException"})
+
+    # WSS
+
+    async def handle_wss(self, request):
+        if request.headers.get("token") not in self.tokens:
+            raise web.HTTPUnauthorized
+
+        socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        self.sockets[socket] = set()
+        received = 0
+
+        async for message in socket:
+            if message.type != WSMsgType.TEXT:
+                continue
+            received += 1
+            self.stats["received"] += 1
+            try:
+                self._handle_frame(socket, json.loads(message.data))
+            except (KeyError, TypeError, ValueError):
+                _LOGGER.warning("Emulator: bad frame %s", message.data)
+            if self.disconnect_every and received % self.disconnect_every == 0:
+                await self._disconnect(socket)
+                break
+
+        self.sockets.pop(socket, None)
+        return socket
+
+    def _handle_frame(self, socket, frame):
+        robot = self.robots.get(frame["thing_name"])
+        if robot is None:
+            return
+        self.sockets[socket].add(robot.thing_name)
+
+        if frame["opt"] == "send_to_device":
+            robot.apply(frame["topic_payload"]["state"])
+            if robot.is_cleaning and robot.task is None:
+                robot.task = asyncio.create_task(self._clean(robot))
+        elif frame["opt"] != "sync_thing":
+            return
+        self._send(socket, self._status_frame(robot))
+
+    async def _clean(self, robot):
+        """Push status and map frames while the robot is cleaning"""
+        try:
+            while robot.tick(self.tick):
+                self._publish(robot, self._status_frame(robot))
+                self._publish(
+                    robot,
+                    {
+                        "notify_info": "map_data",
+                        "thing_name": robot.thing_name,
+                        "map_data": robot.map_payload(room_names=False),
+                    },
+                )
+                await asyncio.sleep(self.tick)
+        finally:
+            robot.task = None
+
+    def _status_frame(self, robot):
+        status = copy.deepcopy(robot.status)
+        if self.stamp_status:
+            status["emulator_sent"] = time.time()
+        return {
+            "notify_info": "thing_status_update",
+            "thing_name": robot.thing_name,
+            "thing_status": status,
+        }
+
+    def _publish(self, robot, frame):
+        for socket, thing_names in list(self.sockets.items()):
+            if robot.thing_name in thing_names:
+                self._send(socket, frame)
+
+    def _send(self, socket, frame):
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self.stats["dropped"] += 1
+            return
+        task = asyncio.create_task(self._deliver(socket, json.dumps(frame)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, socket, message):
+        await self._delay()
+        if socket.closed:
+            return
+        try:
+            await socket.send_str(message)
+            self.stats["sent"] += 1
+        except ConnectionResetError:
+            self.sockets.pop(socket, None)
+
+    async def _delay(self):
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def run(args):
+    emulator = WebackEmulator(
+        robots=args.robots,
+        preset=args.preset,
+        host=args.host,
+        port=args.port,
+        tick=args.tick,
+        points_per_tick=args.points_per_tick,
+        latency=args.latency,
+        jitter=args.jitter,
+        drop_rate=args.drop_rate,
+        disconnect_every=args.disconnect_every,
+        stamp_status=args.stamp_status,
+    )
+    await emulator.start()
+    sys.stdout.write(
+        f"Auth URL: {emulator.auth_url}\n"
+        f"Account: {emulator.user} / {DEFAULT_PASSWORD}\n",
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await emulator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--robots", type=int, default=1)
+    parser.add_argument("--preset", choices=synthmap.PRESETS, default="small")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tick", type=float, default=1.0)
+    parser.add_argument("--points-per-tick", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-every", type=int, default=None)
+    parser.add_argument("--stamp-status", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()